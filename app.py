@@ -1,11 +1,22 @@
+import logging
+import os
+
 import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output
+from flask import Response, request
 from pages import guest_behaviors, revenue_cancellations
+from components.api import api
+from components.cache import figure_cache
+from components.ingest import INGEST_DIR, ingest_status, ingest_upload, start_ingest_watcher, upload_authorized
+from components.metrics import install_request_hooks, render_metrics
+from components.warmup import report_summary, warm_cache
 
 # Initialize the Dash app with a custom Bootstrap theme and external stylesheet
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, '/assets/style.css'], suppress_callback_exceptions=True)
+# (responses are gzip/brotli compressed unless COMPRESS=0)
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, '/assets/style.css'], suppress_callback_exceptions=True,
+                compress=os.environ.get("COMPRESS", "1") == "1")
 server = app.server
 # Define the navigation bar with custom colors
 navbar = dbc.NavbarSimple(
@@ -34,11 +45,55 @@ app.layout = html.Div([
 )
 def display_page(pathname):
     if pathname == "/guest-behaviors":
-        return guest_behaviors.layout
+        return guest_behaviors.layout()
     elif pathname == "/revenue-cancellations":
-        return revenue_cancellations.layout
+        return revenue_cancellations.layout()
     else:
-        return guest_behaviors.layout  
+        return guest_behaviors.layout()
+
+# Figure cache hit/miss counters
+@server.route("/cache-stats")
+def cache_stats():
+    return figure_cache.stats()
+
+# Per-callback phase timings, response sizes, cache hits/misses and errors in the Prometheus text format,
+# summed over all gunicorn workers when METRICS_DIR is set
+install_request_hooks(server)
+
+@server.route("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+# Versioned REST endpoints for the chart aggregates (/api/v1/aggregates/<name>)
+server.register_blueprint(api)
+
+# Threads started per serving process. When gunicorn preloads the app in its master
+# (gunicorn.conf.py) they are started in each worker after the fork instead of here.
+def start_background_tasks():
+    if INGEST_DIR:
+        start_ingest_watcher()
+
+# Incremental ingestion: watch INGEST_DIR for new batches and accept CSV uploads carrying INGEST_TOKEN
+if INGEST_DIR:
+    @server.route("/ingest", methods=["GET", "POST"])
+    def ingest():
+        if request.method == "GET":
+            return ingest_status()
+        if not upload_authorized(request.headers):
+            return {"error": "Uploads need the ingest token (Authorization: Bearer <INGEST_TOKEN>)."}, 403
+        try:
+            result = ingest_upload(request.get_data())
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        # Queued behind a batch that is still being written: the watcher applies it later
+        return result, 202 if 'queued' in result else 200
+
+# Pre-render the common figures before serving (WARMUP_ON_START=1)
+if os.environ.get("WARMUP_ON_START") == "1":
+    logging.getLogger(__name__).info("Cache warm-up: %s", report_summary(warm_cache()))
+
+if os.environ.get("APP_PRELOADED") != "1":
+    start_background_tasks()
 
 # Run the app
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+/* assets/clientside.js */
+/* Clientside slider filtering (SLIDER_MODE=clientside): the server ships per-hotel
+   aggregates once per hotel selection and these functions re-slice them on every drag. */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    hotel_dashboard: {
+        // Lead time histogram with a marginal box, from per-day booking counts
+        lead_time_figure: function (aggregates, range) {
+            if (!aggregates) {
+                return window.dash_clientside.no_update;
+            }
+            var low = range ? range[0] : 0;
+            var high = range ? range[1] : Infinity;
+            var groups = [];
+            aggregates.hotels.forEach(function (hotel) {
+                var counts = hotel.counts.slice(low, Math.min(high, hotel.counts.length - 1) + 1);
+                var total = counts.reduce(function (sum, count) { return sum + count; }, 0);
+                if (total > 0) {
+                    groups.push({hotel: hotel, counts: counts, total: total});
+                }
+            });
+            if (!groups.length) {
+                return emptyFigure("No data available for the selected filters.");
+            }
+
+            // Shared bins over the days that hold bookings
+            var first = Infinity;
+            var last = -Infinity;
+            groups.forEach(function (group) {
+                group.counts.forEach(function (count, i) {
+                    if (count > 0) {
+                        first = Math.min(first, low + i);
+                        last = Math.max(last, low + i);
+                    }
+                });
+            });
+            var width = Math.max(1, Math.ceil((last - first + 1) / aggregates.bins));
+
+            var data = [];
+            groups.forEach(function (group) {
+                var x = [];
+                var y = [];
+                for (var start = first; start <= last; start += width) {
+                    var count = 0;
+                    for (var day = start; day < Math.min(start + width, last + 1); day++) {
+                        count += group.counts[day - low] || 0;
+                    }
+                    x.push(start + (width - 1) / 2);
+                    y.push(count);
+                }
+                var stats = boxStats(group.counts, low, group.total);
+                data.push({
+                    type: "bar",
+                    x: x,
+                    y: y,
+                    name: group.hotel.name,
+                    legendgroup: group.hotel.name,
+                    marker: {color: group.hotel.color},
+                    opacity: 0.7
+                });
+                data.push({
+                    type: "box",
+                    orientation: "h",
+                    y: [group.hotel.name],
+                    q1: [stats.q1],
+                    median: [stats.median],
+                    q3: [stats.q3],
+                    lowerfence: [stats.lowerfence],
+                    upperfence: [stats.upperfence],
+                    x: [stats.outliers],
+                    boxpoints: "outliers",
+                    name: group.hotel.name,
+                    legendgroup: group.hotel.name,
+                    showlegend: false,
+                    marker: {color: group.hotel.color},
+                    xaxis: "x2",
+                    yaxis: "y2"
+                });
+            });
+            return {data: data, layout: aggregates.layout};
+        },
+
+        // Mean ADR per stay length, sized by revenue, from per-stay-length sums
+        adr_stay_figure: function (aggregates, range) {
+            if (!aggregates) {
+                return window.dash_clientside.no_update;
+            }
+            var low = range ? range[0] : 0;
+            var high = range ? range[1] : Infinity;
+            var traces = [];
+            var maxRevenue = 0;
+            aggregates.hotels.forEach(function (hotel) {
+                var trace = {x: [], y: [], revenue: [], customdata: []};
+                for (var stay = low; stay <= Math.min(high, hotel.counts.length - 1); stay++) {
+                    var count = hotel.counts[stay];
+                    if (count > 0) {
+                        trace.x.push(stay);
+                        trace.y.push(hotel.adr_sums[stay] / count);
+                        trace.revenue.push(Math.max(hotel.revenue_sums[stay], 0));
+                        trace.customdata.push([count, hotel.revenue_sums[stay]]);
+                        maxRevenue = Math.max(maxRevenue, hotel.revenue_sums[stay]);
+                    }
+                }
+                if (trace.x.length) {
+                    trace.hotel = hotel;
+                    traces.push(trace);
+                }
+            });
+            if (!traces.length) {
+                return emptyFigure("No data available for the selected filters.");
+            }
+            var data = traces.map(function (trace) {
+                return {
+                    type: "scatter",
+                    mode: "markers",
+                    x: trace.x,
+                    y: trace.y,
+                    customdata: trace.customdata,
+                    name: trace.hotel.name,
+                    marker: {
+                        color: trace.hotel.color,
+                        size: trace.revenue,
+                        sizemode: "area",
+                        sizeref: 2 * Math.max(maxRevenue, 1) / (40 * 40),
+                        sizemin: 3,
+                        opacity: 0.7
+                    },
+                    hovertemplate: "Hotel Type=" + trace.hotel.name + "<br>Total Stay (Nights)=%{x}<br>Mean ADR ($)=%{y:.2f}<br>Bookings=%{customdata[0]}<br>Revenue=%{customdata[1]:,.0f}<extra></extra>"
+                };
+            });
+            return {data: data, layout: aggregates.layout};
+        }
+    }
+});
+
+// Value at a 0-based rank within integer-valued counts starting at `offset`
+function valueAtRank(counts, offset, rank) {
+    var seen = 0;
+    for (var i = 0; i < counts.length; i++) {
+        seen += counts[i];
+        if (seen > rank) {
+            return offset + i;
+        }
+    }
+    return offset + counts.length - 1;
+}
+
+// Linear-interpolated quartiles, Tukey whiskers and the distinct outlier values
+function boxStats(counts, offset, total) {
+    function percentile(q) {
+        var position = (total - 1) * q;
+        var lower = valueAtRank(counts, offset, Math.floor(position));
+        var upper = valueAtRank(counts, offset, Math.ceil(position));
+        return lower + (upper - lower) * (position - Math.floor(position));
+    }
+    var q1 = percentile(0.25);
+    var q3 = percentile(0.75);
+    var iqr = q3 - q1;
+    var lowerfence = Infinity;
+    var upperfence = -Infinity;
+    var outliers = [];
+    counts.forEach(function (count, i) {
+        var value = offset + i;
+        if (count === 0) {
+            return;
+        }
+        if (value < q1 - 1.5 * iqr || value > q3 + 1.5 * iqr) {
+            outliers.push(value);
+        } else {
+            lowerfence = Math.min(lowerfence, value);
+            upperfence = Math.max(upperfence, value);
+        }
+    });
+    return {q1: q1, median: percentile(0.5), q3: q3, lowerfence: lowerfence, upperfence: upperfence, outliers: outliers};
+}
+
+function emptyFigure(message) {
+    return {
+        data: [],
+        layout: {
+            annotations: [{text: message, xref: "paper", yref: "paper", x: 0.5, y: 0.5, showarrow: false, font: {size: 20, color: "#333333"}}],
+            xaxis: {visible: false},
+            yaxis: {visible: false},
+            plot_bgcolor: "white",
+            paper_bgcolor: "white",
+            font: {size: 12, color: "#333333"},
+            showlegend: false
+        }
+    };
+}
@@ -0,0 +1,397 @@
+import argparse
+import gzip
+import http.client
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+import psutil
+
+from benchmarks.run import _outputs
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOAD_PORT = int(os.environ.get("LOAD_PORT", 18050))
+# Seconds between polls of a background callback's job, as the renderer polls it
+BACKGROUND_POLL_SECONDS = 0.25
+RESOURCE_SAMPLE_SECONDS = 0.5
+PERCENTILES = [50, 95, 99]
+
+
+# Gunicorn serving app:server with gunicorn.conf.py, on a local port
+class Server:
+    def __init__(self, workers, threads, port=LOAD_PORT):
+        self.workers = workers
+        self.threads = threads
+        self.port = port
+        self.process = None
+        self.log = None
+
+    def __enter__(self):
+        env = dict(os.environ, BIND=f"127.0.0.1:{self.port}", WEB_CONCURRENCY=str(self.workers), GUNICORN_THREADS=str(self.threads))
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen([sys.executable, "-m", "gunicorn", "app:server"], cwd=REPO_DIR, env=env,
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"gunicorn exited with {self.process.returncode}:\n{self.output()}")
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+                connection.request("GET", "/_dash-layout")
+                if connection.getresponse().status == 200:
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise SystemExit(f"gunicorn did not start serving within 120 seconds:\n{self.output()}")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+    def output(self):
+        self.log.seek(0)
+        return self.log.read().decode(errors="replace")[-4000:]
+
+
+# CPU seconds, peak RSS and final unique memory (USS) of the master and every worker while the load runs
+class ResourceSampler(threading.Thread):
+    def __init__(self, server):
+        super().__init__(name="resource-sampler", daemon=True)
+        self.server = server
+        self.stopped = threading.Event()
+        self.peak_rss = defaultdict(int)
+        self.cpu_start = {}
+
+    def _processes(self):
+        master = psutil.Process(self.server.process.pid)
+        return [('master', master)] + [('worker', worker) for worker in master.children()]
+
+    # Includes finished child processes, e.g. background callback jobs a worker has reaped
+    def _cpu(self, process):
+        times = process.cpu_times()
+        return times.user + times.system + times.children_user + times.children_system
+
+    def start(self):
+        for role, process in self._processes():
+            self.cpu_start[process.pid] = self._cpu(process)
+        self.started = time.perf_counter()
+        super().start()
+
+    def run(self):
+        while not self.stopped.wait(RESOURCE_SAMPLE_SECONDS):
+            for role, process in self._processes():
+                try:
+                    self.peak_rss[process.pid] = max(self.peak_rss[process.pid], process.memory_info().rss)
+                except psutil.NoSuchProcess:
+                    pass
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        elapsed = time.perf_counter() - self.started
+        report = []
+        for role, process in self._processes():
+            try:
+                cpu_seconds = self._cpu(process) - self.cpu_start.get(process.pid, 0.0)
+                memory = process.memory_full_info()
+            except psutil.NoSuchProcess:
+                continue
+            report.append({
+                'role': role,
+                'pid': process.pid,
+                'cpu_seconds': round(cpu_seconds, 3),
+                # Cores kept busy on average; 1.0 is one core fully used
+                'cpu_utilization': round(cpu_seconds / elapsed, 3),
+                'peak_rss_bytes': max(self.peak_rss[process.pid], memory.rss),
+                # Memory only this process holds; the rest of its RSS is shared (e.g. data preloaded before the fork)
+                'uss_bytes': getattr(memory, 'uss', None),
+            })
+        return report
+
+
+# Apply the operations of a Dash Patch response to a tracked value (only plain data props are tracked)
+def apply_patch(value, patch):
+    for operation in patch['operations']:
+        *path, last = operation['location'] or [None]
+        target = value
+        for key in path:
+            target = target[key]
+        params = operation['params']
+        if operation['operation'] == 'Assign':
+            if last is None:
+                value = params['value']
+            else:
+                target[last] = params['value']
+        elif operation['operation'] == 'Delete':
+            target.pop(last, None) if isinstance(target, dict) else target.pop(last)
+        elif operation['operation'] == 'Merge':
+            (target if last is None else target[last]).update(params['value'])
+        elif operation['operation'] in ('Append', 'Extend'):
+            items = [params['value']] if operation['operation'] == 'Append' else params['value']
+            (target if last is None else target[last]).extend(items)
+    return value
+
+
+# Default property values of every component with a string id in a serialized layout tree
+def component_values(tree, values=None):
+    values = {} if values is None else values
+    if isinstance(tree, list):
+        for child in tree:
+            component_values(child, values)
+    elif isinstance(tree, dict) and 'props' in tree:
+        props = tree['props']
+        if isinstance(props.get('id'), str):
+            for prop, value in props.items():
+                if prop not in ('id', 'children'):
+                    values[f"{props['id']}.{prop}"] = value
+        for value in props.values():
+            component_values(value, values)
+    return values
+
+
+# Callbacks are reported by the ids of the components they update
+def _label(dependency):
+    outputs = _outputs(dependency['output'])
+    return ",".join(spec['id'] for spec in (outputs if isinstance(outputs, list) else [outputs]))
+
+
+# One simulated analyst: keeps the browser's component state and fires callbacks the way the
+# Dash renderer does (initial calls when a page renders, then calls for every changed input)
+class Session:
+    def __init__(self, port, dependencies, recorder, rng):
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        self.dependencies = [dependency for dependency in dependencies if not dependency.get('clientside_function')]
+        self.recorder = recorder
+        self.rng = rng
+        self.values = {}
+        # Only props read as inputs or state are kept; figures are counted but not stored
+        self.tracked = {f"{spec['id']}.{spec['property']}" for dependency in self.dependencies
+                        for spec in dependency['inputs'] + dependency['state']}
+
+    def post(self, body, query=""):
+        self.connection.request("POST", f"/_dash-update-component{query}", body=json.dumps(body),
+                                headers={'Content-Type': "application/json", 'Accept-Encoding': "gzip"})
+        response = self.connection.getresponse()
+        payload = response.read()
+        wire_bytes = len(payload)
+        if response.getheader('Content-Encoding') == "gzip":
+            payload = gzip.decompress(payload)
+        return response.status, payload, wire_bytes
+
+    def call(self, dependency, changed):
+        props = lambda specs: [{'id': spec['id'], 'property': spec['property'], 'value': self.values.get(f"{spec['id']}.{spec['property']}")}
+                               for spec in specs]
+        body = {
+            'output': dependency['output'],
+            'outputs': _outputs(dependency['output']),
+            'inputs': props(dependency['inputs']),
+            'state': props(dependency['state']),
+            'changedPropIds': changed,
+        }
+        started = time.perf_counter()
+        wire_bytes = body_bytes = 0
+        try:
+            status, payload, wire_bytes = self.post(body)
+            result = json.loads(payload) if status == 200 else {}
+            # Background callbacks answer with a job to poll until its result is ready
+            while status == 200 and 'cacheKey' in result and 'response' not in result:
+                time.sleep(BACKGROUND_POLL_SECONDS)
+                status, payload, polled_bytes = self.post(body, "?" + urlencode({'cacheKey': result['cacheKey'], 'job': result['job']}))
+                wire_bytes += polled_bytes
+                result = json.loads(payload) if status == 200 and payload else {'cacheKey': result['cacheKey'], 'job': result['job']}
+            body_bytes = len(payload)
+            error = status not in (200, 204)
+        except (OSError, http.client.HTTPException, ValueError):
+            self.connection.close()
+            status, result, error = None, {}, True
+        self.recorder.record(_label(dependency), time.perf_counter() - started, wire_bytes, body_bytes, error)
+        for component_id, props in (result.get('response') or {}).items():
+            for prop, value in props.items():
+                key = f"{component_id}.{prop}"
+                if key == "page-content.children":
+                    component_values(value, self.values)
+                elif key in self.tracked:
+                    self.values[key] = apply_patch(self.values.get(key), value) if isinstance(value, dict) and '__dash_patch_update' in value else value
+
+    # Set a prop as a user interaction would, then fire every callback it is an input of
+    def set(self, prop, value):
+        if self.values.get(prop) == value:
+            return
+        self.values[prop] = value
+        for dependency in self.dependencies:
+            if prop in [f"{spec['id']}.{spec['property']}" for spec in dependency['inputs']]:
+                self.call(dependency, [prop])
+        if prop == "url.pathname":
+            # The new page's components trigger the initial call of every callback they are inputs of
+            for dependency in self.dependencies:
+                inputs = [f"{spec['id']}.{spec['property']}" for spec in dependency['inputs']]
+                if "url.pathname" not in inputs and not dependency.get('prevent_initial_call') and any(key in self.values for key in inputs):
+                    self.call(dependency, [])
+
+    def open(self, pathname):
+        self.values = {key: value for key, value in self.values.items() if key.startswith("url.")}
+        self.set("url.pathname", pathname)
+
+    def hotel(self, dropdown):
+        options = [option['value'] for option in self.values.get(f"{dropdown}.options") or [{'value': "All"}]]
+        self.set(f"{dropdown}.value", self.rng.choice(options))
+
+    # A slider drag is answered once, on release (the sliders use Dash's default updatemode="mouseup")
+    def drag(self, slider):
+        low, high = self.values.get(f"{slider}.min", 0), self.values.get(f"{slider}.max", 100)
+        step = self.values.get(f"{slider}.step", 1)
+        start, end = sorted(self.rng.randrange(low, high + 1, step) for _ in range(2))
+        self.set(f"{slider}.value", [start, min(max(end, start + step), high)])
+
+
+# Realistic session: open a page, filter by hotel, drag the slider a few times, switch page, tabs and back
+def session_actions(session, rng):
+    actions = [
+        lambda: session.open("/guest-behaviors"),
+        lambda: session.hotel("hotel-type-dropdown-gb"),
+    ]
+    actions += [lambda: session.drag("lead-time-slider")] * rng.randint(1, 4)
+    actions += [
+        lambda: session.open("/revenue-cancellations"),
+        lambda: session.hotel("hotel-type-dropdown-rc"),
+    ]
+    actions += [lambda: session.drag("stay-length-slider")] * rng.randint(1, 4)
+    actions += [
+        lambda: session.set("rc-tabs.active_tab", "cancellations-tab"),
+        lambda: session.hotel("hotel-type-dropdown-rc"),
+        lambda: session.set("rc-tabs.active_tab", "revenue-tab"),
+    ]
+    return actions
+
+
+# Latencies and payload sizes per callback, shared by every session thread
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = defaultdict(list)
+
+    def record(self, name, seconds, wire_bytes, body_bytes, error):
+        with self.lock:
+            self.entries[name].append((seconds, wire_bytes, body_bytes, error))
+
+    def report(self, elapsed):
+        callbacks = {}
+        for name, entries in sorted(self.entries.items()):
+            latencies = sorted(entry[0] for entry in entries)
+            callbacks[name] = {
+                'requests': len(entries),
+                'errors': sum(entry[3] for entry in entries),
+                'throughput_per_second': round(len(entries) / elapsed, 2),
+                **{f"p{q}_ms": round(percentile(latencies, q) * 1000, 1) for q in PERCENTILES},
+                'mean_wire_bytes': round(sum(entry[1] for entry in entries) / len(entries)),
+                'mean_body_bytes': round(sum(entry[2] for entry in entries) / len(entries)),
+            }
+        latencies = sorted(entry[0] for entries in self.entries.values() for entry in entries)
+        total = len(latencies)
+        return {
+            'requests': total,
+            'errors': sum(callback['errors'] for callback in callbacks.values()),
+            'throughput_per_second': round(total / elapsed, 2),
+            **{f"p{q}_ms": round(percentile(latencies, q) * 1000, 1) for q in PERCENTILES},
+            'wire_bytes': sum(entry[1] for entries in self.entries.values() for entry in entries),
+            'callbacks': callbacks,
+        }
+
+
+# Nearest-rank percentile of sorted values
+def percentile(values, q):
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def run_sessions(server, users, duration, think_time, seed):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=30)
+    connection.request("GET", "/_dash-dependencies")
+    dependencies = json.loads(connection.getresponse().read())
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    sessions_done = []
+
+    def user(index):
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            session = Session(server.port, dependencies, recorder, rng)
+            for action in session_actions(session, rng):
+                if time.perf_counter() >= deadline:
+                    return
+                action()
+                time.sleep(rng.expovariate(1 / think_time) if think_time > 0 else 0)
+            sessions_done.append(index)
+
+    sampler = ResourceSampler(server)
+    sampler.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(index,), name=f"user-{index}") for index in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'sessions_completed': len(sessions_done),
+        **recorder.report(elapsed),
+        'processes': sampler.stop(),
+    }
+
+
+def print_report(result):
+    print(f"workers={result['workers']} threads={result['threads']} users={result['users']}: "
+          f"{result['throughput_per_second']} req/s, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+          f"p99 {result['p99_ms']} ms, {result['errors']} errors, {result['sessions_completed']} sessions")
+    width = max([len(name) for name in result['callbacks']] + [0]) + 2
+    for name, callback in result['callbacks'].items():
+        print(f"  {name:<{width}}{callback['requests']:>6} req {callback['p50_ms']:>8} {callback['p95_ms']:>8} {callback['p99_ms']:>8} ms"
+              f"{callback['mean_wire_bytes']:>10} B")
+    for process in result['processes']:
+        print(f"  {process['role']} {process['pid']}: {process['cpu_utilization']:.2f} cores, "
+              f"peak RSS {process['peak_rss_bytes'] / 2 ** 20:.0f} MiB, USS {(process['uss_bytes'] or 0) / 2 ** 20:.0f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay analyst sessions against the app under gunicorn for capacity planning.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2], help="gunicorn worker counts to run")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1], help="threads per worker to run")
+    parser.add_argument("--users", type=int, nargs="+", default=[4], help="concurrent sessions to run")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per configuration")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between a user's actions")
+    parser.add_argument("--port", type=int, default=LOAD_PORT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_results.json", help="JSON results file")
+    args = parser.parse_args()
+
+    results = []
+    for workers, threads in itertools.product(args.workers, args.threads):
+        with Server(workers, threads, args.port) as server:
+            for users in args.users:
+                result = {'workers': workers, 'threads': threads, 'users': users, 'think_time': args.think_time,
+                          **run_sessions(server, users, args.duration, args.think_time, args.seed)}
+                print_report(result)
+                results.append(result)
+    with open(args.output, 'w') as f:
+        json.dump({'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import functools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate
+
+DEFAULT_ROWS = [100000, 1000000, 10000000]
+BENCH_DIR = os.environ.get("BENCH_DIR", ".bench")
+
+# Plot builders and the arguments the pages call them with ("{hotel}" is replaced per selection)
+BUILDERS = [
+    ("lead_time_distribution", ["{hotel}", [0, 737]]),
+    ("lead_time_distribution", ["{hotel}", [0, 100]]),
+    ("lead_time_aggregates", ["{hotel}"]),
+    ("stay_duration_patterns", ["{hotel}"]),
+    ("booking_patterns_market_segment", ["{hotel}"]),
+    ("adr_vs_stay_length", ["{hotel}", [0, 50]]),
+    ("adr_vs_stay_length", ["{hotel}", [0, 7]]),
+    ("stay_length_aggregates", ["{hotel}"]),
+    ("cancellations_by_lead_time", ["{hotel}"]),
+    ("cancellation_trends_by_month", ["{hotel}"]),
+    ("booking_trends_heatmap", ["{hotel}"]),
+    ("revenue_by_market_segment", ["{hotel}"]),
+]
+
+# Plotly entry points and figure template helpers whose time counts as figure construction; the rest is data prep
+PX_FUNCTIONS = ['histogram', 'bar', 'scatter', 'box', 'line', 'area', 'density_heatmap']
+FIGURE_METHODS = ['__init__', 'add_trace', 'add_annotation', 'update_layout', 'update_traces']
+TRACE_TYPES = ['Bar', 'Box', 'Scatter', 'Scattergl', 'Heatmap']
+TEMPLATE_FUNCTIONS = ['layout', 'trace', 'figure']
+
+
+# Accumulates the wall time spent inside plotly while active; nested plotly calls count once
+class PlotlyTimer:
+    def __init__(self):
+        self.seconds = 0.0
+        self.depth = 0
+        self.patched = []
+
+    def _wrap(self, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            if self.depth:
+                return func(*args, **kwargs)
+            self.depth += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - start
+                self.depth -= 1
+        return timed
+
+    def __enter__(self):
+        import plotly.express as px
+        import plotly.graph_objects as go
+        from components import templates
+        targets = [(px, name) for name in PX_FUNCTIONS]
+        targets += [(templates, name) for name in TEMPLATE_FUNCTIONS]
+        targets += [(go.Figure, name) for name in FIGURE_METHODS]
+        targets += [(getattr(go, name), '__init__') for name in TRACE_TYPES]
+        for owner, name in targets:
+            original = owner.__dict__[name] if isinstance(owner, type) else getattr(owner, name)
+            setattr(owner, name, self._wrap(original))
+            self.patched.append((owner, name, original))
+        return self
+
+    def __exit__(self, *exc):
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched = []
+
+
+# Serialize a builder result the way the figure cache does
+def _payload(result):
+    from components.serialize import dumps, figure_json
+    if hasattr(result, 'to_json') or set(result) == {'data', 'layout'}:
+        return figure_json(result)
+    return dumps(result)
+
+
+# Time one builder: data prep and figure construction split by PlotlyTimer, then serialization
+def time_builder(plots, name, args):
+    func = getattr(plots, name)
+    with PlotlyTimer() as timer:
+        start = time.perf_counter()
+        result = func(*args)
+        build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    payload = _payload(result)
+    to_json_seconds = time.perf_counter() - start
+    return {
+        'prep_seconds': build_seconds - timer.seconds,
+        'figure_seconds': timer.seconds,
+        'to_json_seconds': to_json_seconds,
+        'total_seconds': build_seconds + to_json_seconds,
+        'payload_bytes': len(payload.encode()),
+    }
+
+
+# Peak Python heap allocation while building and serializing (memory-mapped columns are not counted)
+def peak_memory(plots, name, args):
+    tracemalloc.start()
+    try:
+        _payload(getattr(plots, name)(*args))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _median_result(runs):
+    result = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    result['payload_bytes'] = runs[-1]['payload_bytes']
+    return result
+
+
+def bench_builders(plots, repeat):
+    results = []
+    for hotel in ["All", plots.hotels_for("All")[0]]:
+        for name, template in BUILDERS:
+            args = [hotel if arg == "{hotel}" else arg for arg in template]
+            runs = [time_builder(plots, name, args) for _ in range(repeat)]
+            result = {'kind': 'builder', 'name': name, 'args': args, **_median_result(runs)}
+            result['peak_bytes'] = peak_memory(plots, name, args)
+            results.append(result)
+            print(f"  {name}{tuple(args)}: {result['total_seconds'] * 1000:.1f} ms, {result['payload_bytes']} bytes", file=sys.stderr)
+    return results
+
+
+# Default property values of every component in the page layouts, keyed "id.property"
+def layout_values(layouts):
+    values = {"url.pathname": "/guest-behaviors"}
+    for layout in layouts:
+        for component in layout._traverse():
+            component_id = getattr(component, 'id', None)
+            if isinstance(component_id, str):
+                for prop in component._prop_names:
+                    value = getattr(component, prop, None)
+                    if value is not None:
+                        values[f"{component_id}.{prop}"] = value
+    return values
+
+
+def _outputs(output):
+    if output.startswith(".."):
+        return [{'id': spec.rsplit('.', 1)[0], 'property': spec.rsplit('.', 1)[1]} for spec in output[2:-2].split("...")]
+    return {'id': output.rsplit('.', 1)[0], 'property': output.rsplit('.', 1)[1]}
+
+
+# Request body for /_dash-update-component as the browser sends it on first render
+def callback_request(dependency, values):
+    def props(specs):
+        return [{'id': spec['id'], 'property': spec['property'], 'value': values.get(f"{spec['id']}.{spec['property']}")} for spec in specs]
+    return {
+        'output': dependency['output'],
+        'outputs': _outputs(dependency['output']),
+        'inputs': props(dependency['inputs']),
+        'state': props(dependency['state']),
+        'changedPropIds': [f"{spec['id']}.{spec['property']}" for spec in dependency['inputs']],
+    }
+
+
+# Every server-side callback through the Flask test client: cold (empty figure cache) and warm
+def bench_callbacks(plots, repeat):
+    import app
+    from components.cache import figure_cache
+    from pages import guest_behaviors, revenue_cancellations
+
+    client = app.server.test_client()
+    client.get("/")
+    dependencies = json.loads(client.get("/_dash-dependencies").data)
+    values = layout_values([guest_behaviors.layout(), revenue_cancellations.layout()])
+    results = []
+    for hotel in ["All", plots.hotels_for("All")[0]]:
+        hotel_values = {key: hotel if key.startswith("hotel-type-dropdown") and key.endswith(".value") else value for key, value in values.items()}
+        for dependency in dependencies:
+            if dependency.get('clientside_function'):
+                continue
+            body = callback_request(dependency, hotel_values)
+            timings = {'cold': [], 'warm': []}
+            for _ in range(repeat):
+                for phase in ['cold', 'warm']:
+                    if phase == 'cold':
+                        figure_cache.clear()
+                    start = time.perf_counter()
+                    response = client.post("/_dash-update-component", json=body)
+                    timings[phase].append(time.perf_counter() - start)
+            results.append({
+                'kind': 'callback',
+                'name': dependency['output'],
+                'args': [hotel],
+                'status': response.status_code,
+                'cold_seconds': statistics.median(timings['cold']),
+                'warm_seconds': statistics.median(timings['warm']),
+                'total_seconds': statistics.median(timings['cold']),
+                'payload_bytes': len(response.data),
+            })
+            print(f"  callback {dependency['output']} ({hotel}): {results[-1]['cold_seconds'] * 1000:.1f} ms cold", file=sys.stderr)
+    return results
+
+
+# Runs in a subprocess per dataset size, with HOTEL_DATA_PATH / HOTEL_CACHE_DIR pointing at it
+def worker(output, repeat):
+    from components.dataset import CACHE_DIR, DATA_PATH, load_dataset
+
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    start = time.perf_counter()
+    rows = len(load_dataset(DATA_PATH, CACHE_DIR))
+    cache_build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    from components import plots
+    plots.preload()
+    startup_seconds = time.perf_counter() - start
+
+    result = {
+        'rows': rows,
+        'hotels': len(plots.hotels_for("All")),
+        'cache_build_seconds': cache_build_seconds,
+        'startup_seconds': startup_seconds,
+        'results': bench_builders(plots, repeat) + bench_callbacks(plots, repeat),
+    }
+    with open(output, 'w') as f:
+        json.dump(result, f)
+
+
+def ensure_dataset(work_dir, rows, hotels):
+    path = os.path.join(work_dir, f"bookings-{rows}-{hotels}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {rows} synthetic bookings ({hotels} hotels)...", file=sys.stderr)
+        generate(f"{path}.tmp", rows, hotels)
+        os.replace(f"{path}.tmp", path)
+    return path
+
+
+def run_scale(work_dir, rows, hotels, repeat):
+    path = ensure_dataset(work_dir, rows, hotels)
+    env = dict(os.environ, HOTEL_DATA_PATH=path, HOTEL_CACHE_DIR=os.path.join(work_dir, f"cache-{rows}-{hotels}"))
+    for name in ["FIGURE_CACHE_DIR", "INGEST_DIR", "WARMUP_ON_START"]:
+        env.pop(name, None)
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        subprocess.run([sys.executable, "-m", "benchmarks.run", "--worker", output.name, "--repeat", str(repeat)], env=env, check=True)
+        with open(output.name) as f:
+            return json.load(f)
+
+
+# Entries that got slower than `threshold` times their baseline timing
+def regressions(results, baseline, threshold):
+    def keyed(report):
+        return {(scale['rows'], scale['hotels'], entry['kind'], entry['name'], json.dumps(entry['args'])): entry
+                for scale in report['scales'] for entry in scale['results']}
+    before = keyed(baseline)
+    slower = []
+    for key, entry in keyed(results).items():
+        if key in before and before[key]['total_seconds'] > 0:
+            ratio = entry['total_seconds'] / before[key]['total_seconds']
+            if ratio > threshold:
+                slower.append({'rows': key[0], 'hotels': key[1], 'kind': key[2], 'name': key[3], 'args': entry['args'], 'ratio': round(ratio, 2)})
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plot builders and Dash callbacks on synthetic bookings.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="dataset sizes to run")
+    parser.add_argument("--hotels", type=int, default=2, help="number of properties in the synthetic data")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (the median is reported)")
+    parser.add_argument("--work-dir", default=BENCH_DIR, help="where synthetic datasets and caches are kept")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.repeat)
+        return
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    import dash
+    import pandas
+    import plotly
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'pandas': pandas.__version__,
+            'plotly': plotly.__version__,
+            'dash': dash.__version__,
+        },
+        'scales': [],
+    }
+    for rows in args.rows:
+        print(f"Benchmarking {rows} rows...", file=sys.stderr)
+        report['scales'].append(run_scale(args.work_dir, rows, args.hotels, args.repeat))
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = regressions(report, json.load(f), args.threshold)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    if report.get('regressions'):
+        for entry in report['regressions']:
+            print(f"Regression: {entry['kind']} {entry['name']}{tuple(entry['args'])} at {entry['rows']} rows is {entry['ratio']}x slower", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+# Child process: import the app the way gunicorn does, then load the dataset as the preload hook does
+CHILD = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+from components import plots
+loaded_at_import = plots._live is not None
+plots.preload()
+print(json.dumps({'import_seconds': imported - started, 'load_seconds': time.perf_counter() - imported,
+                  'dataset_loaded_at_import': loaded_at_import, 'load_timings': plots.load_timings}))
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+# Module rows of `python -X importtime` output: self and cumulative microseconds, nesting depth
+def parse_importtime(stderr):
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({'module': name, 'self_us': int(self_us), 'cumulative_us': int(cumulative_us), 'depth': len(indent) // 2})
+    return modules
+
+
+def profile_startup(cold=False, top=15):
+    env = dict(os.environ)
+    for name in ["INGEST_DIR", "WARMUP_ON_START"]:
+        env.pop(name, None)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if cold:
+            # An empty cache directory makes the load parse the CSV and build the columnar cache
+            env['HOTEL_CACHE_DIR'] = cache_dir
+        child = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD], env=env, capture_output=True, text=True)
+    if child.returncode:
+        raise SystemExit(child.stderr)
+    modules = parse_importtime(child.stderr)
+    packages = defaultdict(int)
+    for module in modules:
+        packages[module['module'].split('.')[0]] += module['self_us']
+    return {
+        **json.loads(child.stdout.strip().splitlines()[-1]),
+        'cold_cache': cold,
+        # Self time summed per top-level package: where the import time goes
+        'packages': [{'package': name, 'self_seconds': us / 1e6} for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]],
+        'slowest_modules': [{**module, 'self_seconds': module['self_us'] / 1e6, 'cumulative_seconds': module['cumulative_us'] / 1e6}
+                            for module in sorted(modules, key=lambda module: -module['self_us'])[:top]],
+    }
+
+
+def print_report(report):
+    print(f"import app: {report['import_seconds'] * 1000:.0f} ms "
+          f"(dataset loaded at import: {'yes' if report['dataset_loaded_at_import'] else 'no'})")
+    print(f"preload ({'cold' if report['cold_cache'] else 'warm'} cache): {report['load_seconds'] * 1000:.0f} ms")
+    for step, seconds in report['load_timings'].items():
+        print(f"  {step:<28}{seconds * 1000:>9.1f} ms")
+    print("import self time by package:")
+    for entry in report['packages']:
+        print(f"  {entry['package']:<28}{entry['self_seconds'] * 1000:>9.1f} ms")
+    print("slowest modules (self / cumulative):")
+    for entry in report['slowest_modules']:
+        print(f"  {entry['module']:<40}{entry['self_seconds'] * 1000:>9.1f} ms {entry['cumulative_seconds'] * 1000:>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile app startup: module import time per package and dataset load steps.")
+    parser.add_argument("--cold", action="store_true", help="load with an empty columnar cache (parses the CSV)")
+    parser.add_argument("--top", type=int, default=15, help="packages and modules to list")
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+    report = profile_startup(args.cold, args.top)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
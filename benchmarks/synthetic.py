@@ -0,0 +1,60 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Same columns as cleaned_hotel_bookings.csv that the dashboard reads
+MARKET_SEGMENTS = ['Online TA', 'Offline TA/TO', 'Groups', 'Direct', 'Corporate', 'Complementary', 'Aviation']
+MARKET_SEGMENT_WEIGHTS = [0.47, 0.20, 0.17, 0.10, 0.04, 0.01, 0.01]
+FIRST_ARRIVAL = pd.Timestamp('2015-07-01')
+ARRIVAL_DAYS = 793
+CHUNK_ROWS = 1000000
+
+
+def hotel_names(hotels):
+    if hotels == 2:
+        return ['City Hotel', 'Resort Hotel']
+    return [f"Hotel {i:04d}" for i in range(hotels)]
+
+
+# One chunk of bookings with roughly the shape of the real data: long-tailed lead times,
+# cancellations more likely for early bookings, weekday-heavy stays and gamma-distributed rates
+def synthetic_chunk(rng, rows, hotels):
+    names = hotel_names(hotels)
+    lead_time = np.minimum(rng.exponential(90, rows), 737).astype('int64')
+    week_nights = np.minimum(rng.poisson(2.5, rows), 40)
+    weekend_nights = np.minimum(rng.poisson(0.9, rows), 16)
+    return pd.DataFrame({
+        'hotel': np.array(names)[rng.integers(0, len(names), rows)],
+        'is_canceled': (rng.random(rows) < 0.2 + 0.4 * lead_time / 737).astype('int64'),
+        'lead_time': lead_time,
+        'arrival_date': (FIRST_ARRIVAL + pd.to_timedelta(rng.integers(0, ARRIVAL_DAYS, rows), unit='D')).strftime('%Y-%m-%d'),
+        'stays_in_weekend_nights': weekend_nights,
+        'stays_in_week_nights': week_nights,
+        'adr': rng.gamma(4, 25, rows).round(2),
+        'market_segment': rng.choice(MARKET_SEGMENTS, rows, p=MARKET_SEGMENT_WEIGHTS),
+    })
+
+
+# Write `rows` synthetic bookings to a CSV, one chunk at a time
+def generate(path, rows, hotels=2, seed=0):
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', newline='') as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = synthetic_chunk(rng, min(CHUNK_ROWS, rows - start), hotels)
+            chunk.to_csv(f, index=False, header=start == 0)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic hotel bookings with the dashboard's schema.")
+    parser.add_argument("path", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--hotels", type=int, default=2, help="number of properties")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.path, args.rows, args.hotels, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import pandas as pd
+from flask import Blueprint, Response, request
+
+from components import plots
+from components.serialize import dumps
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+API_VERSION = "v1"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+# Seconds clients and proxies may reuse a response before revalidating it with If-None-Match
+API_MAX_AGE = int(os.environ.get("API_MAX_AGE", 300))
+
+# Endpoint name -> table function in components/plots.py behind the chart of the same data
+AGGREGATES = {
+    'stay-duration': plots.stay_duration_table,
+    'market-segments': plots.market_segment_table,
+    'cancellation-rates': plots.cancellation_rate_table,
+    'revenue': plots.revenue_table,
+}
+
+api = Blueprint("api", __name__, url_prefix=f"/api/{API_VERSION}")
+
+
+# Table with the integer calendar keys labeled and categories as plain strings
+def _output_table(table):
+    table = table.copy()
+    for col in table.columns:
+        if isinstance(table[col].dtype, pd.CategoricalDtype):
+            table[col] = table[col].astype(str)
+    if 'month' in table:
+        table['month'] = plots.month_labels(table['month'])
+    if 'year_month' in table:
+        table['year_month'] = plots.year_month_labels(table['year_month'])
+    return table
+
+
+def _arrow(table):
+    sink = pa.BufferOutputStream()
+    batch = pa.Table.from_pandas(table, preserve_index=False)
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_table(batch)
+    return sink.getvalue().to_pybytes()
+
+
+# Compact columnar JSON: column names once, then one list per column
+def _json(name, hotel_type, table):
+    return dumps({
+        'version': API_VERSION,
+        'aggregate': name,
+        'hotel': hotel_type,
+        'dataset_version': plots.dataset_version,
+        'columns': list(table.columns),
+        'data': {col: table[col].tolist() for col in table.columns},
+    })
+
+
+# Hash of this module, which labels and encodes the tables
+@lru_cache(maxsize=None)
+def _source_hash():
+    with open(__file__, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+
+def _error(message, status):
+    return Response(dumps({'error': message}), status=status, mimetype="application/json")
+
+
+@api.route("/aggregates")
+def aggregates_index():
+    return {'version': API_VERSION, 'aggregates': sorted(AGGREGATES), 'hotels': ["All"] + plots.hotels_for("All"),
+            'formats': ["json"] + (["arrow"] if pa is not None else [])}
+
+
+# GET /api/v1/aggregates/<name>?hotel=All[&format=json|arrow]. The ETag is derived from the dataset
+# version, the chart code and settings (plots.render_fingerprint), this module and the request, so a
+# repeat request with If-None-Match is answered 304 without aggregating, and never after a deploy
+# or configuration change that alters the body.
+@api.route("/aggregates/<name>")
+def aggregate(name):
+    if name not in AGGREGATES:
+        return _error(f"Unknown aggregate '{name}'.", 404)
+    hotel_type = request.args.get("hotel", "All")
+    if hotel_type != "All" and hotel_type not in plots.hotels_for("All"):
+        return _error(f"Unknown hotel '{hotel_type}'.", 404)
+    output_format = request.args.get("format")
+    if output_format is None:
+        output_format = "arrow" if request.accept_mimetypes.best_match(["application/json", ARROW_MIMETYPE]) == ARROW_MIMETYPE else "json"
+    if output_format not in ("json", "arrow"):
+        return _error(f"Unknown format '{output_format}'.", 400)
+    if output_format == "arrow" and pa is None:
+        return _error("Arrow output requires pyarrow.", 406)
+
+    etag = hashlib.sha1(f"{API_VERSION}:{plots.dataset_version}:{plots.render_fingerprint()}:{_source_hash()}:"
+                        f"{name}:{hotel_type}:{output_format}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        table = _output_table(AGGREGATES[name](hotel_type))
+        if output_format == "arrow":
+            response = Response(_arrow(table), mimetype=ARROW_MIMETYPE)
+        else:
+            response = Response(_json(name, hotel_type, table), mimetype="application/json")
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={API_MAX_AGE}"
+    response.vary.add("Accept")
+    return response
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from components import plots
+from components.callbacks import BACKGROUND_CACHE_DIR, EXECUTION_MODE
+from components.metrics import count, phase
+from components.serialize import dumps, figure_json, loads
+
+# Memory budget for cached figures and optional directory shared by all workers
+# (point FIGURE_CACHE_DIR at /dev/shm to keep the shared copy in memory). Background jobs build
+# figures in processes that exit afterwards, so in background mode the cache always has a
+# directory (under BACKGROUND_CACHE_DIR unless FIGURE_CACHE_DIR is set).
+FIGURE_CACHE_BYTES = int(os.environ.get("FIGURE_CACHE_BYTES", 64 * 1024 * 1024))
+FIGURE_CACHE_DIR = os.environ.get("FIGURE_CACHE_DIR") or (
+    os.path.join(BACKGROUND_CACHE_DIR, "figures") if EXECUTION_MODE == "background" else None)
+
+
+# Lists arrive from sliders, so make them hashable and stable
+def _normalize(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# LRU cache of serialized figures keyed on (function, arguments, dataset version, render fingerprint).
+# The fingerprint covers the chart code and settings, so a shared directory that outlives a deploy
+# or is used with another configuration never serves figures built differently.
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES, directory=FIGURE_CACHE_DIR, version=lambda: plots.dataset_version,
+                 fingerprint=lambda: plots.render_fingerprint()):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.version = version
+        self.fingerprint = fingerprint
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, func, *args):
+        return (func.__name__, _normalize(args), self.version(), self.fingerprint())
+
+    # Return the figure for func(*args) as plain JSON data, building and storing it on a miss
+    def figure(self, func, *args):
+        key = self.key(func, *args)
+        payload = self.get(key)
+        if payload is None:
+            fig = func(*args)
+            with phase("serialize"):
+                payload = figure_json(fig)
+            # A failed build is shown but not kept, so it is retried rather than served from the cache
+            if not isinstance(fig, plots.ErrorFigure):
+                self.set(key, payload)
+        with phase("serialize"):
+            return loads(payload)
+
+    # Same as figure() for functions returning JSON-serializable data
+    def data(self, func, *args):
+        key = self.key(func, *args)
+        payload = self.get(key)
+        if payload is None:
+            data = func(*args)
+            with phase("serialize"):
+                payload = dumps(data)
+            self.set(key, payload)
+        with phase("serialize"):
+            return loads(payload)
+
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                count('cache_hits')
+                return payload
+        payload = self._read_disk(key)
+        with self.lock:
+            if payload is None:
+                self.misses += 1
+                count('cache_misses')
+                return None
+            self.disk_hits += 1
+            count('cache_hits')
+        self._store(key, payload)
+        return payload
+
+    # Membership test that does not touch the hit/miss counters
+    def has(self, key):
+        with self.lock:
+            if key in self.entries:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(key))
+
+    def set(self, key, payload):
+        self._store(key, payload)
+        self._write_disk(key, payload)
+
+    # Insert into the in-memory LRU, evicting the oldest entries past the byte budget
+    def _store(self, key, payload):
+        if len(payload) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+            self.entries[key] = payload
+            self.bytes += len(payload)
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + ".json")
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        # Touch the file so disk eviction is least-recently-used too
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return payload
+
+    def _write_disk(self, key, payload):
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self._prune_disk()
+
+    # Drop the least recently used files once the directory exceeds the byte budget
+    def _prune_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    # Forget every in-memory entry (the shared directory is left alone)
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'shared_dir': self.directory,
+            }
+
+
+figure_cache = FigureCache()
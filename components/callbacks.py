@@ -0,0 +1,192 @@
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from dash import DiskcacheManager, Output, Patch, callback, ctx, no_update
+from dash.exceptions import PreventUpdate
+
+from components.metrics import adopt_recorder, recording
+
+# "batched" registers one multi-output callback per page; "separate" keeps one callback per figure
+CALLBACK_MODE = os.environ.get("CALLBACK_MODE", "batched")
+
+# "server" re-renders slider-driven figures on the server; "clientside" ships per-hotel aggregates
+# once per hotel selection and re-slices them in the browser (assets/clientside.js)
+SLIDER_MODE = os.environ.get("SLIDER_MODE", "server")
+
+# "1" answers server-side slider moves with a Patch of the shown figure instead of a whole new figure
+SLIDER_PATCH = os.environ.get("SLIDER_PATCH", "1") == "1"
+
+# "background" renders the slider-driven charts (lead time, ADR vs. stay length) as Dash background
+# callbacks in separate processes, so slow builds do not hold the request threads that serve the
+# other charts; "inline" (default) renders everything in the request
+EXECUTION_MODE = os.environ.get("EXECUTION_MODE", "inline")
+# Background builds allowed to compute at once on this host, shared by all gunicorn workers
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", max((os.cpu_count() or 2) // 2, 1)))
+# Job results and build slots live here (diskcache, no external broker)
+BACKGROUND_CACHE_DIR = os.environ.get("BACKGROUND_CACHE_DIR", ".background_cache")
+# How often the browser polls for a finished job, in milliseconds
+BACKGROUND_POLL_MS = int(os.environ.get("BACKGROUND_POLL_MS", 250))
+# Seconds a dispatch waits for a free build slot before it is dropped (the chart keeps its figure)
+BACKGROUND_QUEUE_SECONDS = float(os.environ.get("BACKGROUND_QUEUE_SECONDS", 10))
+SLOT_WAIT_SECONDS = 0.05
+# How long the dispatch time and measurements of a job are kept for the request delivering its result
+JOB_RECORD_SECONDS = 600
+
+
+# Lock file of one of the BACKGROUND_WORKERS build slots, held exclusively, or None when all are busy.
+# Slots are file locks, so the kernel frees the slot of a job that exits or is killed.
+def _try_slot():
+    os.makedirs(BACKGROUND_CACHE_DIR, exist_ok=True)
+    for slot in range(BACKGROUND_WORKERS):
+        lock = open(os.path.join(BACKGROUND_CACHE_DIR, f"slot-{slot}.lock"), 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock
+        except BlockingIOError:
+            lock.close()
+    return None
+
+
+# Hold a build slot while the block runs, waiting for one to free up
+@contextmanager
+def build_slot():
+    while True:
+        lock = _try_slot()
+        if lock is not None:
+            with lock:
+                yield
+            return
+        time.sleep(SLOT_WAIT_SECONDS)
+
+
+# Dispatches in this worker run one at a time, so the only slot lock open while a job is forked is
+# the one handed to that job
+_dispatch_lock = threading.Lock()
+# Slot handed to the job being forked; the job sees it set and does not take another
+_dispatch = {'slot': None}
+
+
+# Background job manager that measures jobs from the web worker: it notes when each job is
+# dispatched, and the request that delivers a job's result takes over the measurements the job
+# recorded in its own process (adopt_recorder), so background charts show up in /metrics with
+# their queue wait and their full duration from dispatch to result
+#
+# It also bounds the job processes, not just the builds: a build slot is taken before the job is
+# started and the forked job inherits it, so at most BACKGROUND_WORKERS jobs exist per host. A
+# dispatch waits up to BACKGROUND_QUEUE_SECONDS for a slot and is then dropped.
+class MeasuredDiskcacheManager(DiskcacheManager):
+    def call_job_fn(self, key, job_fn, args, context):
+        dispatched = time.time()
+        with _dispatch_lock:
+            slot = _try_slot()
+            while slot is None:
+                if time.time() - dispatched > BACKGROUND_QUEUE_SECONDS:
+                    raise PreventUpdate
+                time.sleep(SLOT_WAIT_SECONDS)
+                slot = _try_slot()
+            _dispatch['slot'] = slot.name
+            try:
+                job = super().call_job_fn(key, job_fn, args, context)
+            finally:
+                # The job keeps the inherited lock until it exits
+                _dispatch['slot'] = None
+                slot.close()
+        self.handle.set(f"job-dispatched-{job}", dispatched, expire=JOB_RECORD_SECONDS)
+        return job
+
+    def get_result(self, key, job):
+        result = super().get_result(key, job)
+        if result is not self.UNDEFINED and job:
+            dispatched = self.handle.pop(f"job-dispatched-{job}", None)
+            recorder = self.handle.pop(f"job-metrics-{job}", None)
+            if dispatched is not None and recorder is not None:
+                adopt_recorder(recorder, dispatched)
+        return result
+
+
+def _background_manager():
+    import diskcache
+    return MeasuredDiskcacheManager(diskcache.Cache(BACKGROUND_CACHE_DIR))
+
+
+background_manager = _background_manager() if EXECUTION_MODE == "background" else None
+
+
+# Ids of the components whose change triggered the running callback (empty on the initial call)
+def triggered_ids():
+    return {prop_id.split('.')[0] for prop_id in ctx.triggered_prop_ids}
+
+
+# True when the callback should recompute outputs depending on the given inputs
+def inputs_changed(*component_ids):
+    triggered = triggered_ids()
+    return not triggered or any(component_id in triggered for component_id in component_ids)
+
+
+# Update for a figure redrawn because only `slider_id` moved. The browser already shows this chart
+# for the same hotel selection with the same theme, so the Patch replaces the traces and the
+# layout settings (resetting the axis ranges to the new data) and leaves the template in place.
+# Empty and error figures have no traces and are sent whole.
+def slider_update(figure, slider_id):
+    if not SLIDER_PATCH or triggered_ids() != {slider_id} or not figure['data']:
+        return figure
+    patch = Patch()
+    patch['data'] = figure['data']
+    for key, value in figure['layout'].items():
+        if key != 'template':
+            patch['layout'][key] = value
+    # Message of an empty figure shown before this one
+    del patch['layout']['annotations']
+    return patch
+
+
+# Figures on tabs are only computed while their tab is showing, and only when their arguments
+# differ from the ones stored for the last render (the browser keeps the previous figure)
+def needs_render(active_tab, tab_id, rendered_args, args):
+    return active_tab == tab_id and rendered_args != list(args)
+
+
+# Store holding the arguments a tab figure with its own callback was last rendered with. Each such
+# figure has its own store, so no two callbacks share an output (Dash derives the allow_duplicate
+# suffix from the inputs alone, which tab figures with the same inputs would have in common).
+def rendered_store(graph_id):
+    return f"{graph_id}-rendered"
+
+
+# Wrap a figure update for a tab. The wrapped callback takes the figure's arguments, the active tab
+# and the figure's rendered_store() value, and returns the figure plus the arguments to store
+def lazy_tab_figure(update, tab_id):
+    def wrapper(*values):
+        *args, active_tab, rendered_args = values
+        if not needs_render(active_tab, tab_id, rendered_args, args):
+            return no_update, no_update
+        return update(*args), list(args)
+    wrapper.__name__ = update.__name__
+    return wrapper
+
+
+# Register `update` as a background callback rendering `graph_id`. Each call runs in its own
+# process, started once a build slot is free. When a newer slider value arrives while a job is
+# still in flight, Dash sends the stale job along and it is killed. The graph is dimmed meanwhile.
+# The job leaves its measurements and the time it started building for the worker that delivers
+# the result. A job not forked with its slot (another start method) takes one itself.
+def background_figure(update, graph_id, *dependencies, **kwargs):
+    def run(*args):
+        with recording() as recorder, (nullcontext() if _dispatch['slot'] else build_slot()):
+            recorder['building'] = time.time()
+            try:
+                return update(*args)
+            finally:
+                background_manager.handle.set(f"job-metrics-{os.getpid()}", recorder, expire=JOB_RECORD_SECONDS)
+    run.__name__ = update.__name__
+    return callback(
+        *dependencies,
+        background=True,
+        manager=background_manager,
+        interval=BACKGROUND_POLL_MS,
+        running=[(Output(graph_id, "style"), {"opacity": 0.5}, {"opacity": 1})],
+        **kwargs
+    )(run)
@@ -0,0 +1,78 @@
+import pandas as pd
+
+from components.metrics import timed
+
+# Dimensions of the aggregate cube and the additive measures kept per cell
+CUBE_KEYS = ['hotel', 'year', 'month', 'year_month', 'market_segment', 'is_canceled']
+CUBE_MEASURES = ['count', 'stay_sum', 'revenue_sum', 'canceled']
+
+
+# Group booking rows into cube cells (year_month adds no cells: it follows from year and month)
+def _aggregate(df):
+    rows = pd.DataFrame({
+        'hotel': df['hotel'],
+        'year': df['arrival_year'],
+        'month': df['arrival_month'],
+        'year_month': df['arrival_year_month'],
+        'market_segment': df['market_segment'],
+        'is_canceled': df['is_canceled'],
+        'total_stay': df['total_stay'].astype('int64'),
+        'revenue': df['revenue'].astype('float64'),
+    })
+    return rows.groupby(CUBE_KEYS, observed=True, sort=True).agg(
+        count=('total_stay', 'size'),
+        stay_sum=('total_stay', 'sum'),
+        revenue_sum=('revenue', 'sum'),
+        canceled=('is_canceled', 'sum'),
+    ).reset_index()
+
+
+# Cells summed over hotels, so "All" queries that do not split by hotel never touch per-hotel cells
+def _merge_hotels(cells):
+    keys = [key for key in CUBE_KEYS if key != 'hotel']
+    return cells.groupby(keys, observed=True, sort=True)[CUBE_MEASURES].sum().reset_index()
+
+
+# Materialized aggregates of the bookings, one row per (hotel, year, month, market_segment, is_canceled)
+class AggregateCube:
+    def __init__(self, df):
+        self.cells = _aggregate(df)
+        self.merged = _merge_hotels(self.cells)
+
+    # Cube around already aggregated cells (e.g. loaded from the dataset cache)
+    @classmethod
+    def from_cells(cls, cells):
+        cube = cls.__new__(cls)
+        cube.cells = cells
+        cube.merged = _merge_hotels(cells)
+        return cube
+
+    # New cube with the rows of `batch` added; only the batch is grouped, then merged cell by cell
+    def extended(self, batch):
+        cells = [self.cells, _aggregate(batch)]
+        for col in ['hotel', 'market_segment']:
+            categories = cells[0][col].cat.categories.union(cells[1][col].cat.categories, sort=False)
+            cells = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in cells]
+        return AggregateCube.from_cells(
+            pd.concat(cells, ignore_index=True).groupby(CUBE_KEYS, observed=True, sort=True)[CUBE_MEASURES].sum().reset_index()
+        )
+
+    # Same cells with the categorical dimensions reordered to `categories` ({column: values})
+    def with_categories(self, categories):
+        cells = self.cells.assign(**{col: self.cells[col].cat.set_categories(values) for col, values in categories.items()})
+        return AggregateCube.from_cells(cells.sort_values(CUBE_KEYS, ignore_index=True))
+
+    # Cells for one hotel, or every cell for "All"
+    def select(self, hotel_type=None):
+        if hotel_type and hotel_type != "All":
+            return self.cells[self.cells['hotel'] == hotel_type]
+        return self.cells
+
+    # Measures summed over every dimension not listed in `by`
+    @timed("aggregate")
+    def totals(self, by, hotel_type=None, measures=CUBE_MEASURES):
+        if 'hotel' not in by and (not hotel_type or hotel_type == "All"):
+            cells = self.merged
+        else:
+            cells = self.select(hotel_type)
+        return cells.groupby(by, observed=True, sort=True)[measures].sum().reset_index()
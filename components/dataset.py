@@ -0,0 +1,415 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from components.cube import AggregateCube
+from components.filters import SORTED_COLUMNS, position_dtype
+
+# Location of the raw bookings file and of the columnar cache built from it
+DATA_PATH = os.environ.get("HOTEL_DATA_PATH", "cleaned_hotel_bookings.csv")
+CACHE_DIR = os.environ.get("HOTEL_CACHE_DIR", ".dataset_cache")
+
+# Bump when the on-disk layout changes so old caches are rebuilt
+CACHE_FORMAT = 5
+
+# Rows per CSV chunk while building the cache; bounds peak memory of the build
+CHUNK_ROWS = int(os.environ.get("HOTEL_CSV_CHUNK_ROWS", 200000))
+
+required_columns = ['hotel', 'lead_time', 'arrival_date', 'stays_in_weekend_nights', 'stays_in_week_nights', 'adr', 'market_segment', 'is_canceled']
+
+# Compact dtypes for the cached columns (derived columns included)
+CATEGORICAL_COLUMNS = ['hotel', 'market_segment']
+NUMERIC_DTYPES = {
+    'lead_time': 'int16',
+    'stays_in_weekend_nights': 'int8',
+    'stays_in_week_nights': 'int8',
+    'is_canceled': 'int8',
+    'adr': 'float32',
+    'total_stay': 'int16',
+    'revenue': 'float32',
+    # Calendar keys of arrival_date; arrival_year_month counts months since 1970-01
+    'arrival_year': 'int16',
+    'arrival_month': 'int8',
+    'arrival_year_month': 'int32',
+}
+# Categorical columns are stored as codes into the manifest's category lists
+CODE_DTYPE = 'int16'
+COLUMN_DTYPES = {
+    **{col: CODE_DTYPE for col in CATEGORICAL_COLUMNS},
+    'arrival_date': 'datetime64[ns]',
+    **NUMERIC_DTYPES,
+}
+
+# Dtypes used while parsing the CSV, before range checks narrow the numeric columns
+CSV_DTYPES = {
+    'hotel': 'str',
+    'market_segment': 'str',
+    'arrival_date': 'str',
+    'lead_time': 'int64',
+    'stays_in_weekend_nights': 'int64',
+    'stays_in_week_nights': 'int64',
+    'adr': 'float64',
+    'is_canceled': 'int64',
+}
+
+
+# Hash the raw file in blocks so large files are never held in memory
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# Write through a temporary file so readers never see a half-written pointer
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+# Cast to a narrow dtype, refusing values that would overflow it
+def _narrow(series, dtype):
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        info = np.iinfo(dtype)
+        if len(series) and (series.min() < info.min or series.max() > info.max):
+            raise ValueError(f"Column '{series.name}' does not fit in {dtype}")
+    return series.to_numpy(dtype=dtype)
+
+
+# Validate raw booking rows and return them with the derived columns in the cached dtypes
+def prepare_rows(raw):
+    missing_columns = [col for col in required_columns if col not in raw.columns]
+    if missing_columns:
+        raise ValueError(f"Dataset is missing required columns: {missing_columns}")
+    raw = raw[required_columns].copy()
+    raw['total_stay'] = raw['stays_in_weekend_nights'] + raw['stays_in_week_nights']
+    raw['revenue'] = raw['adr'] * raw['total_stay']
+    columns = {col: pd.Categorical(raw[col].astype(str)) for col in CATEGORICAL_COLUMNS}
+    columns['arrival_date'] = pd.to_datetime(raw['arrival_date']).to_numpy(dtype='datetime64[ns]')
+    # Integer calendar keys, computed once so monthly charts never format dates per request
+    months = columns['arrival_date'].astype('datetime64[M]').astype('int64')
+    raw['arrival_year_month'] = months
+    raw['arrival_year'] = months // 12 + 1970
+    raw['arrival_month'] = months % 12 + 1
+    for col, dtype in NUMERIC_DTYPES.items():
+        columns[col] = _narrow(raw[col], dtype)
+    return pd.DataFrame(columns)
+
+
+# Check the CSV header once so chunks can be read with a fixed column list and dtypes
+def _check_header(path):
+    columns = pd.read_csv(path, nrows=0).columns
+    missing_columns = [col for col in required_columns if col not in columns]
+    if missing_columns:
+        raise ValueError(f"Dataset is missing required columns: {missing_columns}")
+
+
+# Rewrite category codes in place so categories end up sorted, as pd.Categorical would order them
+def _sort_categories(codes_path, categories, rows):
+    order = sorted(categories)
+    if order == categories or not rows:
+        return order
+    mapping = np.array([order.index(value) for value in categories], dtype=CODE_DTYPE)
+    codes = np.memmap(codes_path, dtype=CODE_DTYPE, mode='r+', shape=(rows,))
+    for start in range(0, rows, CHUNK_ROWS):
+        codes[start:start + CHUNK_ROWS] = mapping[codes[start:start + CHUNK_ROWS]]
+    codes.flush()
+    del codes
+    return order
+
+
+# Reorder the column files so each hotel's rows are contiguous (file order is kept within a
+# hotel), one chunk at a time. Returns {hotel: [start, stop]} for the manifest.
+def _partition_by_hotel(build_dir, hotels, rows):
+    if not rows:
+        return {hotel: [0, 0] for hotel in hotels}
+    paths = {col: os.path.join(build_dir, f"{col}.bin") for col in COLUMN_DTYPES}
+    sources = {col: np.memmap(path, dtype=COLUMN_DTYPES[col], mode='r', shape=(rows,)) for col, path in paths.items()}
+    counts = np.zeros(len(hotels), dtype='int64')
+    for start in range(0, rows, CHUNK_ROWS):
+        counts += np.bincount(sources['hotel'][start:start + CHUNK_ROWS], minlength=len(hotels))
+    # Counting sort: every hotel's next free slot in the partitioned files
+    cursor = np.cumsum(counts) - counts
+    partitions = {hotel: [int(start), int(start + count)] for hotel, start, count in zip(hotels, cursor, counts)}
+
+    targets = {col: np.memmap(f"{path}.part", dtype=COLUMN_DTYPES[col], mode='w+', shape=(rows,)) for col, path in paths.items()}
+    for start in range(0, rows, CHUNK_ROWS):
+        codes = np.asarray(sources['hotel'][start:start + CHUNK_ROWS])
+        order = np.argsort(codes, kind='stable')
+        chunk_counts = np.bincount(codes, minlength=len(hotels))
+        sorted_codes = codes[order]
+        destination = np.empty(len(codes), dtype='int64')
+        destination[order] = cursor[sorted_codes] + np.arange(len(codes)) - (np.cumsum(chunk_counts) - chunk_counts)[sorted_codes]
+        cursor += chunk_counts
+        for col, target in targets.items():
+            target[destination] = sources[col][start:start + CHUNK_ROWS]
+    for target in targets.values():
+        target.flush()
+    del sources, targets
+    for path in paths.values():
+        os.replace(f"{path}.part", path)
+    return partitions
+
+
+# Row orderings by value of the filter index's range columns (FilterIndex.orders), each followed by
+# the values in that order: one over all rows and one per hotel, where every hotel's ordering fills
+# its own partition's range of the file. Workers map them instead of sorting at every start.
+def _write_orders(build_dir, partitions, rows):
+    dtype = position_dtype(rows)
+    for col in SORTED_COLUMNS:
+        values = np.fromfile(os.path.join(build_dir, f"{col}.bin"), dtype=COLUMN_DTYPES[col])
+        hotel_order = np.empty(rows, dtype=dtype)
+        for start, stop in partitions.values():
+            hotel_order[start:stop] = start + np.argsort(values[start:stop], kind='stable')
+        for name, order in [('order', np.argsort(values, kind='stable').astype(dtype)), ('hotel-order', hotel_order)]:
+            order.tofile(os.path.join(build_dir, f"{col}.{name}.bin"))
+            values[order].tofile(os.path.join(build_dir, f"{col}.{name}-values.bin"))
+
+
+# Stream the CSV in chunks: each chunk is validated and narrowed, appended to one raw column
+# file per column and folded into the aggregate cube, so memory stays bounded by CHUNK_ROWS
+def _build_cache(path, cache_dir, stat, file_hash):
+    _check_header(path)
+    build_dir = os.path.join(cache_dir, f".build-{os.getpid()}")
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    categories = {col: [] for col in CATEGORICAL_COLUMNS}
+    cube = None
+    rows = 0
+    files = {col: open(os.path.join(build_dir, f"{col}.bin"), 'wb') for col in COLUMN_DTYPES}
+    try:
+        for raw in pd.read_csv(path, usecols=required_columns, dtype=CSV_DTYPES, chunksize=CHUNK_ROWS):
+            chunk = prepare_rows(raw)
+            for col in CATEGORICAL_COLUMNS:
+                # Codes stay stable across chunks: new values are appended to the known categories
+                known = categories[col]
+                seen = set(known)
+                known.extend(value for value in chunk[col].cat.categories if value not in seen)
+                if len(known) > np.iinfo(CODE_DTYPE).max:
+                    raise ValueError(f"Column '{col}' has too many distinct values")
+                chunk[col] = chunk[col].cat.set_categories(known)
+                chunk[col].cat.codes.to_numpy().astype(CODE_DTYPE).tofile(files[col])
+            for col in ['arrival_date'] + list(NUMERIC_DTYPES):
+                chunk[col].to_numpy().tofile(files[col])
+            cube = AggregateCube(chunk) if cube is None else cube.extended(chunk)
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+    if cube is None:
+        cube = AggregateCube(prepare_rows(pd.read_csv(path, usecols=required_columns, dtype=CSV_DTYPES, nrows=0)))
+
+    for col in CATEGORICAL_COLUMNS:
+        categories[col] = _sort_categories(os.path.join(build_dir, f"{col}.bin"), categories[col], rows)
+    partitions = _partition_by_hotel(build_dir, categories['hotel'], rows)
+    _write_orders(build_dir, partitions, rows)
+    cube.with_categories(categories).cells.to_pickle(os.path.join(build_dir, "cube.pkl"))
+
+    manifest = {
+        'format': CACHE_FORMAT,
+        'source': os.path.abspath(path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': file_hash,
+        'rows': rows,
+        'categories': categories,
+        'partitions': partitions,
+        'dtypes': COLUMN_DTYPES,
+        'dir': file_hash[:16],
+    }
+    final_dir = os.path.join(cache_dir, manifest['dir'])
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.rename(build_dir, final_dir)
+    _write_json(os.path.join(cache_dir, "manifest.json"), manifest)
+    # Drop caches of older file versions; workers still mapping them keep their pages
+    for name in os.listdir(cache_dir):
+        if name != manifest['dir'] and not name.startswith('.') and os.path.isdir(os.path.join(cache_dir, name)):
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    return manifest
+
+
+# Return a manifest that matches the CSV on disk, rebuilding the cache if needed
+def _ensure_cache(path, cache_dir):
+    stat = os.stat(path)
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    manifest = _read_json(manifest_path)
+    if (manifest and manifest.get('format') == CACHE_FORMAT
+            and manifest['mtime_ns'] == stat.st_mtime_ns and manifest['size'] == stat.st_size):
+        return manifest
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Only one worker builds; the others wait on the lock and reuse its result
+    with open(os.path.join(cache_dir, ".lock"), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = _read_json(manifest_path)
+        if (manifest and manifest.get('format') == CACHE_FORMAT
+                and manifest['mtime_ns'] == stat.st_mtime_ns and manifest['size'] == stat.st_size):
+            return manifest
+        file_hash = _file_hash(path)
+        if (manifest and manifest.get('format') == CACHE_FORMAT and manifest['sha256'] == file_hash
+                and os.path.isdir(os.path.join(cache_dir, manifest['dir']))):
+            # Touched but unchanged: keep the cached columns
+            manifest.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            _write_json(manifest_path, manifest)
+            return manifest
+        return _build_cache(path, cache_dir, stat, file_hash)
+
+
+def _manifest(path, cache_dir):
+    try:
+        return _ensure_cache(path, cache_dir)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"The file '{path}' was not found. Please ensure it is in the project directory.")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error loading dataset: {str(e)}")
+
+
+def _array(data_dir, manifest, name, dtype):
+    if not manifest['rows']:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(os.path.join(data_dir, f"{name}.bin"), dtype=dtype, mode='r', shape=(manifest['rows'],))
+
+
+def _column(data_dir, manifest, col):
+    return _array(data_dir, manifest, col, manifest['dtypes'][col])
+
+
+# DataFrame backed by the memory-mapped column files in data_dir
+def _frame(data_dir, manifest):
+    columns = {}
+    for col in CATEGORICAL_COLUMNS:
+        columns[col] = pd.Categorical.from_codes(_column(data_dir, manifest, col), categories=manifest['categories'][col])
+    for col in ['arrival_date'] + list(NUMERIC_DTYPES):
+        columns[col] = _column(data_dir, manifest, col)
+    df = pd.DataFrame(columns, copy=False)
+    # Where the columns are mapped from, so ingested batches can be appended to the same files
+    df.attrs['data_dir'] = data_dir
+    return df
+
+
+# Manifest of the current cache build, rebuilding it first if the CSV changed. Pass it to the
+# load_* functions so the columns, orderings and cube all come from the same build.
+def load_manifest(path=DATA_PATH, cache_dir=CACHE_DIR):
+    return _manifest(path, cache_dir)
+
+
+# Load the bookings as a DataFrame backed by memory-mapped columns
+def load_dataset(path=DATA_PATH, cache_dir=CACHE_DIR, manifest=None):
+    manifest = manifest or _manifest(path, cache_dir)
+    df = _frame(os.path.join(cache_dir, manifest['dir']), manifest)
+    # Identifies the cached content; used to key derived caches
+    df.attrs['version'] = manifest['sha256'][:16]
+    # Contiguous row range of each hotel, so a hotel selection only touches its own pages
+    df.attrs['partitions'] = {hotel: tuple(bounds) for hotel, bounds in manifest['partitions'].items()}
+    return df
+
+
+# Load the aggregate cube that was built alongside the columnar cache
+def load_cube(path=DATA_PATH, cache_dir=CACHE_DIR, manifest=None):
+    manifest = manifest or _manifest(path, cache_dir)
+    return AggregateCube.from_cells(pd.read_pickle(os.path.join(cache_dir, manifest['dir'], "cube.pkl")))
+
+
+# Memory-mapped value orderings of the cached rows, keyed like FilterIndex.orders
+def load_orders(path=DATA_PATH, cache_dir=CACHE_DIR, manifest=None):
+    manifest = manifest or _manifest(path, cache_dir)
+    data_dir = os.path.join(cache_dir, manifest['dir'])
+    dtype = position_dtype(manifest['rows'])
+    orders = {}
+    for col in SORTED_COLUMNS:
+        arrays = {name: (_array(data_dir, manifest, f"{col}.{name}", dtype), _array(data_dir, manifest, f"{col}.{name}-values", COLUMN_DTYPES[col]))
+                  for name in ['order', 'hotel-order']}
+        orders[("All", col)] = arrays['order']
+        for hotel, (start, stop) in manifest['partitions'].items():
+            order, values = arrays['hotel-order']
+            orders[(hotel, col)] = (order[start:stop], values[start:stop])
+    return orders
+
+
+# Rows held by the column files in data_dir (-1 when they are missing or disagree), e.g. after an
+# append that was interrupted
+def _stored_rows(data_dir):
+    try:
+        sizes = {os.path.getsize(os.path.join(data_dir, f"{col}.bin")) // np.dtype(dtype).itemsize for col, dtype in COLUMN_DTYPES.items()}
+    except FileNotFoundError:
+        return -1
+    return sizes.pop() if len(sizes) == 1 else -1
+
+
+# Append `batch` to the column files in data_dir, encoding its categorical columns as codes into `categories`
+def _append_rows(data_dir, batch, categories):
+    for col, dtype in COLUMN_DTYPES.items():
+        with open(os.path.join(data_dir, f"{col}.bin"), 'ab') as f:
+            if col in CATEGORICAL_COLUMNS:
+                pd.Categorical(batch[col], categories=categories[col]).codes.astype(dtype).tofile(f)
+            else:
+                batch[col].to_numpy().astype(dtype, copy=False).tofile(f)
+
+
+# Copy the columns of `df` into a fresh cache_dir/ingest-<name> directory, dropping other ingest directories
+def _copy_columns(df, name, cache_dir):
+    build_dir = os.path.join(cache_dir, f".ingest-{name}-{os.getpid()}")
+    data_dir = os.path.join(cache_dir, f"ingest-{name}")
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    for col, dtype in COLUMN_DTYPES.items():
+        with open(os.path.join(build_dir, f"{col}.bin"), 'wb') as f:
+            values = df[col].cat.codes.to_numpy() if col in CATEGORICAL_COLUMNS else df[col].to_numpy()
+            values.astype(dtype, copy=False).tofile(f)
+    # Workers still mapping a removed directory keep their pages
+    for entry in os.listdir(cache_dir):
+        if entry.startswith("ingest-"):
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+    os.rename(build_dir, data_dir)
+    return data_dir
+
+
+# `df` with the prepared rows of `batch` appended, as memory-mapped columns. The rows are appended to
+# the column files `df` is mapped from (past the rows the cache manifest covers, which loads ignore),
+# so a batch costs a write of its own rows only and every worker maps the grown files, sharing their
+# pages. The files' ingest.json records the row count and categories after each batch under its
+# dataset version `name`, so the other workers, and the same batches applied again after a
+# restart, map what the first worker wrote. Categories are widened by appending the batch's new
+# values, so the stored codes stay valid. When the files have already grown past `df` with other
+# batches, `df` is copied once into cache_dir/ingest-<name> and later batches are appended there.
+# Appended rows are folded into the partitioned cache by its next full rebuild from the CSV.
+def append_columns(df, batch, name, cache_dir=CACHE_DIR):
+    categories = {}
+    for col in CATEGORICAL_COLUMNS:
+        known = list(df[col].cat.categories)
+        seen = set(known)
+        categories[col] = known + [value for value in batch[col].cat.categories if value not in seen]
+        if len(categories[col]) > np.iinfo(CODE_DTYPE).max:
+            raise ValueError(f"Column '{col}' has too many distinct values")
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, ".ingest.lock"), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        data_dir = df.attrs.get('data_dir')
+        log = (_read_json(os.path.join(data_dir, "ingest.json")) if data_dir else None) or []
+        entry = next((entry for entry in log if entry['version'] == name), None)
+        if entry is None:
+            if not data_dir or _stored_rows(data_dir) != len(df):
+                data_dir, log = _copy_columns(df, name, cache_dir), []
+            _append_rows(data_dir, batch, categories)
+            entry = {'version': name, 'rows': len(df) + len(batch), 'categories': categories}
+            _write_json(os.path.join(data_dir, "ingest.json"), log + [entry])
+        return _frame(data_dir, {'rows': entry['rows'], 'categories': entry['categories'], 'dtypes': COLUMN_DTYPES})
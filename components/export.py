@@ -0,0 +1,156 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly.graph_objects as go
+
+from components import plots
+
+# Every chart the snapshots include, with the dashboard's default slider ranges
+EXPORT_CHARTS = [
+    ("lead_time_distribution", [[0, 737]]),
+    ("stay_duration_patterns", []),
+    ("booking_patterns_market_segment", []),
+    ("adr_vs_stay_length", [[0, 50]]),
+    ("cancellations_by_lead_time", []),
+    ("cancellation_trends_by_month", []),
+    ("booking_trends_heatmap", []),
+    ("revenue_by_market_segment", []),
+]
+
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+EXPORT_FORMATS = ["html", "png", "svg"]
+EXPORT_PROCESSES = int(os.environ.get("EXPORT_PROCESSES", os.cpu_count() or 1))
+# Image size in pixels for PNG/SVG/PDF output
+EXPORT_WIDTH = 1200
+EXPORT_HEIGHT = 700
+MANIFEST_NAME = "manifest.json"
+
+def _slug(value):
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+
+
+# Directory name for one hotel value: readable slug plus a short hash of the raw name, so values
+# that slug alike (e.g. "City Hotel" and "City-Hotel") never share and overwrite a directory
+def _hotel_dir(hotel_type):
+    return f"{_slug(hotel_type)}-{hashlib.sha1(hotel_type.encode()).hexdigest()[:8]}".lstrip("-")
+
+
+# Code and settings that shape the exported files: the charts' render fingerprint (every module the
+# builders import, the Plotly version and the chart settings) plus this module, which titles and sizes them
+def _code_hash():
+    digest = hashlib.sha256(plots.render_fingerprint().encode())
+    with open(__file__, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+# Identifies the content of one exported chart: a matching file on disk does not need rendering again
+def _content_hash(code_hash, name, args):
+    return hashlib.sha256(json.dumps([plots.dataset_version, code_hash, name, args]).encode()).hexdigest()
+
+
+def export_jobs(formats, output_dir=EXPORT_DIR):
+    jobs = []
+    for hotel_type in ["All"] + plots.hotels_for("All"):
+        for name, args in EXPORT_CHARTS:
+            paths = {fmt: os.path.join(output_dir, _hotel_dir(hotel_type), f"{name}.{fmt}") for fmt in formats}
+            jobs.append((name, [hotel_type, *args], paths))
+    return jobs
+
+
+# Runs in a pool process: build one chart and write it in every requested format. Returns the
+# formats written and the error of each format that failed (e.g. kaleido without a browser).
+def _export(name, args, paths):
+    fig = getattr(plots, name)(*args)
+    if isinstance(fig, dict):
+        fig = go.Figure(fig)
+    if fig.layout.title.text:
+        fig.update_layout(title_text=f"{fig.layout.title.text} ({args[0]})")
+    written, failed = [], {}
+    for fmt, path in paths.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            if fmt == "html":
+                # Self-contained: plotly.js is embedded, so the file opens offline
+                fig.write_html(tmp_path, include_plotlyjs=True, full_html=True)
+            else:
+                fig.write_image(tmp_path, format=fmt, width=EXPORT_WIDTH, height=EXPORT_HEIGHT)
+            os.replace(tmp_path, path)
+            written.append(fmt)
+        except Exception as e:
+            failed[fmt] = str(e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return written, failed
+
+
+# Render every chart for every hotel value in a process pool, skipping outputs whose dataset
+# version and chart code are unchanged since they were written
+def export_charts(output_dir=EXPORT_DIR, formats=EXPORT_FORMATS, processes=EXPORT_PROCESSES, force=False):
+    started = time.time()
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    code_hash = _code_hash()
+    report = {'written': [], 'unchanged': [], 'failed': []}
+
+    pending = []
+    for name, args, paths in export_jobs(formats, output_dir):
+        content_hash = _content_hash(code_hash, name, args)
+        stale = {fmt: path for fmt, path in paths.items()
+                 if force or manifest.get(path) != content_hash or not os.path.exists(path)}
+        report['unchanged'] += [path for fmt, path in paths.items() if fmt not in stale]
+        if stale:
+            pending.append((name, args, stale, content_hash))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {executor.submit(_export, name, args, stale): (name, args, stale, content_hash)
+                       for name, args, stale, content_hash in pending}
+            for future in as_completed(futures):
+                name, args, stale, content_hash = futures[future]
+                try:
+                    written, failed = future.result()
+                except Exception as e:
+                    written, failed = [], {fmt: str(e) for fmt in stale}
+                for fmt in written:
+                    manifest[stale[fmt]] = content_hash
+                    report['written'].append(stale[fmt])
+                report['failed'] += [[stale[fmt], error] for fmt, error in failed.items()]
+
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+    report['elapsed_seconds'] = round(time.time() - started, 3)
+    report['dataset_version'] = plots.dataset_version
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write static snapshots of every dashboard chart for every hotel.")
+    parser.add_argument("--output-dir", default=EXPORT_DIR, help="directory for the exported files")
+    parser.add_argument("--formats", nargs="+", default=EXPORT_FORMATS, choices=["html", "png", "svg", "pdf"],
+                        help="PNG, SVG and PDF are rendered with kaleido")
+    parser.add_argument("--processes", type=int, default=EXPORT_PROCESSES, help="size of the process pool")
+    parser.add_argument("--force", action="store_true", help="re-render outputs even if they are unchanged")
+    args = parser.parse_args()
+    report = export_charts(args.output_dir, args.formats, args.processes, args.force)
+    print(json.dumps(report, indent=2))
+    if report['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
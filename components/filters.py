@@ -0,0 +1,147 @@
+import numpy as np
+
+from components.metrics import timed
+
+# Columns that get a pre-sorted row ordering for range filters
+SORTED_COLUMNS = ['lead_time', 'total_stay']
+
+
+# Narrowest integer type for row positions into a frame of `rows` rows
+def position_dtype(rows):
+    return np.dtype('int32') if rows < 2 ** 31 else np.dtype('int64')
+
+
+# Row-position index over the dataset so filters resolve without scanning or copying the table
+class FilterIndex:
+    def __init__(self, df, sorted_columns=SORTED_COLUMNS, orders=None):
+        self.df = df
+        self.sorted_columns = sorted_columns
+        # Row positions per hotel ("All" covers every row); partitioned frames give them as ranges
+        partitions = df.attrs.get('partitions')
+        codes = df['hotel'].cat.codes.to_numpy()
+        dtype = position_dtype(len(df))
+        self.rows = {"All": np.arange(len(df), dtype=dtype)}
+        for code, hotel in enumerate(df['hotel'].cat.categories):
+            if partitions is not None:
+                self.rows[hotel] = np.arange(*partitions.get(hotel, (0, 0)), dtype=dtype)
+            else:
+                self.rows[hotel] = np.flatnonzero(codes == code).astype(dtype)
+        self.hotels = [hotel for hotel in df['hotel'].cat.categories if len(self.rows[hotel])]
+        # Per hotel and column: row positions ordered by value, plus the sorted values for binary
+        # search. Orderings passed in (memory-mapped from the columnar cache, dataset.load_orders)
+        # are used as they are; the rest are sorted here.
+        self.orders = dict(orders or {})
+        for col in sorted_columns:
+            values = df[col].to_numpy()
+            for hotel, rows in self.rows.items():
+                if (hotel, col) not in self.orders:
+                    order = rows[np.argsort(values[rows], kind='stable')]
+                    self.orders[(hotel, col)] = (order, values[order])
+        # Rows appended by ingestion and their sorted orderings, kept apart (see extended)
+        self.added_rows = {}
+        self.added_orders = {}
+
+    # New index over `df`, which must be this index's frame with rows appended. The row lists and
+    # orderings of the earlier rows are shared as they are (memory-mapped ones stay mapped); the
+    # appended rows are kept apart, sorted, and merged into the span a query reads, so a batch costs
+    # work and memory in proportion to the appended rows rather than the whole table.
+    def extended(self, df):
+        start = len(self.df)
+        index = FilterIndex.__new__(FilterIndex)
+        index.df = df
+        index.sorted_columns = self.sorted_columns
+        dtype = position_dtype(len(df))
+        batch_rows = np.arange(start, len(df), dtype=dtype)
+        batch_codes = df['hotel'].cat.codes.to_numpy()[start:]
+        batch = {"All": batch_rows}
+        for code, hotel in enumerate(df['hotel'].cat.categories):
+            batch[hotel] = batch_rows[batch_codes == code]
+        index.rows = dict(self.rows)
+        index.added_rows = {}
+        for hotel, rows in batch.items():
+            index.rows.setdefault(hotel, batch_rows[:0])
+            index.added_rows[hotel] = np.concatenate([self.added_rows.get(hotel, batch_rows[:0]), rows]).astype(dtype, copy=False)
+        index.hotels = [hotel for hotel in df['hotel'].cat.categories if len(index.rows[hotel]) or len(index.added_rows[hotel])]
+        index.orders = dict(self.orders)
+        index.added_orders = {}
+        for col in self.sorted_columns:
+            values = df[col].to_numpy()
+            for hotel, rows in batch.items():
+                index.orders.setdefault((hotel, col), (batch_rows[:0], values[:0]))
+                order, sorted_values = self.added_orders.get((hotel, col), (batch_rows[:0], values[:0]))
+                rows = rows[np.argsort(values[rows], kind='stable')]
+                index.added_orders[(hotel, col)] = _merged(order, sorted_values, rows, values[rows])
+        return index
+
+    # Row positions for a hotel and an optional inclusive range on one sorted column
+    @timed("filter")
+    def positions(self, hotel_type=None, **ranges):
+        hotel = hotel_type if hotel_type and hotel_type != "All" else "All"
+        if hotel not in self.rows:
+            return self.rows["All"][:0]
+        ranges = {col: bounds for col, bounds in ranges.items() if bounds}
+        if not ranges:
+            added = self.added_rows.get(hotel)
+            return np.concatenate([self.rows[hotel], added]) if added is not None and len(added) else self.rows[hotel]
+        if len(ranges) > 1:
+            raise ValueError(f"Only one range filter is supported at a time, got {sorted(ranges)}")
+        col, value_range = next(iter(ranges.items()))
+        return self._ordered(hotel, col, value_range)[0]
+
+    # Ascending values of a sorted column for a hotel and an optional inclusive range (a view)
+    @timed("filter")
+    def sorted_values(self, column, hotel_type=None, value_range=None):
+        hotel = hotel_type if hotel_type and hotel_type != "All" else "All"
+        if hotel not in self.rows:
+            return self.orders[("All", column)][1][:0]
+        return self._ordered(hotel, column, value_range)[1]
+
+    # Ascending values of a sorted column split by the values of another column
+    @timed("filter")
+    def sorted_groups(self, column, by, hotel_type=None):
+        hotel = hotel_type if hotel_type and hotel_type != "All" else "All"
+        if hotel not in self.rows:
+            return {}
+        order, values = self._ordered(hotel, column, None)
+        if not len(values):
+            return {}
+        # Masking keeps the ascending order, so no group needs re-sorting
+        keys = self.df[by].to_numpy()[order]
+        return {key.item(): values[keys == key] for key in np.unique(keys)}
+
+    # Row positions and values of a hotel's ordering inside the range. Without appended rows these
+    # are slices (views) of the stored ordering; otherwise the appended rows in the range are merged in.
+    def _ordered(self, hotel, column, value_range):
+        order, values = self.orders[(hotel, column)]
+        span = _span(values, value_range)
+        added = self.added_orders.get((hotel, column))
+        if added is None:
+            return order[span], values[span]
+        added_span = _span(added[1], value_range)
+        return _merged(order[span], values[span], added[0][added_span], added[1][added_span])
+
+    # Filtered frame holding only the requested columns
+    @timed("filter")
+    def take(self, columns, hotel_type=None, **ranges):
+        positions = self.positions(hotel_type, **ranges)
+        if len(positions) == len(self.df):
+            return self.df[columns]
+        return self.df[columns].take(positions)
+
+
+# Slice of an ascending values array that falls inside the inclusive range
+def _span(sorted_values, value_range):
+    if not value_range:
+        return slice(None)
+    start = np.searchsorted(sorted_values, value_range[0], side='left')
+    stop = np.searchsorted(sorted_values, value_range[1], side='right')
+    return slice(start, stop)
+
+
+# Two orderings merged by value; on equal values the first ordering's rows (the earlier ones) come first
+def _merged(order, sorted_values, added_order, added_values):
+    if not len(added_order):
+        return order, sorted_values
+    at = np.searchsorted(sorted_values, added_values, side='right')
+    dtype = np.result_type(order, added_order)
+    return np.insert(order.astype(dtype, copy=False), at, added_order), np.insert(sorted_values, at, added_values)
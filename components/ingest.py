@@ -0,0 +1,123 @@
+import hashlib
+import hmac
+import io
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from components import plots
+from components.dataset import append_columns, prepare_rows
+
+# Directory watched for new booking batches (.csv or .parquet); every worker applies every batch.
+# Files are applied in name order, so name them with a sortable prefix such as a timestamp.
+INGEST_DIR = os.environ.get("INGEST_DIR")
+INGEST_POLL_SECONDS = float(os.environ.get("INGEST_POLL_SECONDS", 5))
+# Producers must write a batch under another name (e.g. a dot-prefixed temporary file, which is
+# ignored) and rename it into place. As a guard against files written in place, a batch is only
+# read once it has not been modified for this many seconds; later batches wait behind it, so every
+# worker applies the batches in the same order.
+INGEST_SETTLE_SECONDS = float(os.environ.get("INGEST_SETTLE_SECONDS", 2))
+BATCH_EXTENSIONS = ('.csv', '.parquet')
+# Shared secret for CSV uploads to /ingest, sent as "Authorization: Bearer <token>". Uploads are
+# refused while it is unset; the client address is not trusted, since behind a reverse proxy on
+# the same host every client appears as localhost.
+INGEST_TOKEN = os.environ.get("INGEST_TOKEN")
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+# Batch file name -> result of applying it
+_applied = {}
+_failed = {}
+
+
+def read_batch(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+# True when the request headers carry the upload token
+def upload_authorized(headers):
+    if not INGEST_TOKEN:
+        return False
+    return hmac.compare_digest(headers.get("Authorization", ""), f"Bearer {INGEST_TOKEN}")
+
+
+# Add one batch of raw rows to the live dataset. Derived columns are computed for the new rows
+# only, the grown columns are written once per host and memory-mapped by every worker
+# (dataset.append_columns), the filter index and cube are extended rather than rebuilt, and the
+# dataset version is bumped so cached figures are invalidated.
+def apply_batch(raw, batch_id):
+    batch = prepare_rows(raw)
+    with _lock:
+        current = plots.data()
+        version = hashlib.sha1(f"{current.version}:{batch_id}".encode()).hexdigest()[:16]
+        df = append_columns(current.df, batch, version)
+        # Take the batch back from the widened frame so its categories match the new index
+        batch = df.iloc[len(current.df):]
+        plots.replace_dataset(df, current.filter_index.extended(df), current.cube.extended(batch), version)
+    return {'rows': len(batch), 'total_rows': len(df), 'version': version}
+
+
+# Apply, in name order, every batch file in the directory that this process has not seen yet.
+# Stops at the first batch modified within INGEST_SETTLE_SECONDS unless it is one of `settled`.
+def scan_batches(directory=INGEST_DIR, settled=()):
+    results = {}
+    with _lock:
+        for name in sorted(os.listdir(directory)):
+            if name.startswith('.') or not name.endswith(BATCH_EXTENSIONS) or name in _applied or name in _failed:
+                continue
+            path = os.path.join(directory, name)
+            if name not in settled and time.time() - os.stat(path).st_mtime < INGEST_SETTLE_SECONDS:
+                break
+            try:
+                results[name] = _applied[name] = apply_batch(read_batch(path), name)
+            except Exception as e:
+                _failed[name] = str(e)
+                logger.warning("Ingest: skipped batch '%s': %s", name, e)
+    return results
+
+
+def _watch(directory, interval):
+    while True:
+        try:
+            scan_batches(directory)
+        except Exception as e:
+            logger.warning("Ingest: scanning '%s' failed: %s", directory, e)
+        time.sleep(interval)
+
+
+# Poll the batch directory from a daemon thread in this process
+def start_ingest_watcher(directory=INGEST_DIR, interval=INGEST_POLL_SECONDS):
+    os.makedirs(directory, exist_ok=True)
+    scan_batches(directory)
+    thread = threading.Thread(target=_watch, args=(directory, interval), name="ingest-watcher", daemon=True)
+    thread.start()
+    return thread
+
+
+# Validate an uploaded CSV batch, publish it to the batch directory for every worker, and apply
+# it in this worker right away. The lock is held from publishing to applying, so the watcher
+# thread cannot apply the batch in between. A batch queued behind an unsettled one is applied
+# by the watcher later.
+def ingest_upload(body, directory=INGEST_DIR):
+    prepare_rows(pd.read_csv(io.BytesIO(body)))
+    name = f"{time.time_ns()}-{os.getpid()}.csv"
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    with _lock:
+        os.replace(tmp_path, os.path.join(directory, name))
+        scan_batches(directory, settled={name})
+        if name in _failed:
+            raise ValueError(_failed[name])
+        return _applied.get(name, {'queued': name})
+
+
+def ingest_status():
+    current = plots.data()
+    return {'version': current.version, 'rows': len(current.df), 'applied': sorted(_applied), 'failed': _failed}
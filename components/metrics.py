@@ -0,0 +1,342 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from dash.exceptions import PreventUpdate
+from flask import g, has_request_context, request
+
+# Histogram bucket upper bounds for durations (seconds) and response sizes (bytes)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1000, 10000, 100000, 1000000, 10000000)
+
+# Phases of a callback request: index filtering, aggregation (cube totals, bins, box statistics),
+# figure building (everything else the callback does) and serialization (to_json plus Dash's encoding)
+PHASES = ['filter', 'aggregate', 'figure', 'serialize']
+
+# Directory where every worker process publishes its measurements; /metrics then reports the sum
+# over all workers (gunicorn.conf.py sets one per server). Unset, /metrics reports this process only.
+METRICS_DIR = os.environ.get("METRICS_DIR")
+# How often a worker publishes its measurements when they changed
+METRICS_PUBLISH_SECONDS = float(os.environ.get("METRICS_PUBLISH_SECONDS", 1.0))
+
+# Hotel label for filter values that are not a hotel in the data, so arbitrary request payloads
+# cannot create new label series
+OTHER_HOTEL_LABEL = "other"
+
+COUNTERS = {
+    'requests': "Callback requests",
+    'errors': "Callbacks that raised or built an error figure",
+    'cache_hits': "Figure cache hits",
+    'cache_misses': "Figure cache misses",
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+# Process-wide counters and histograms, rendered in the Prometheus text format
+class CallbackMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = defaultdict(float)
+
+    def observe(self, name, labels, value, buckets=SECONDS_BUCKETS):
+        with self.lock:
+            key = (name, tuple(labels))
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self.counters[(name, tuple(labels))] += amount
+
+    # Plain JSON form of every series, as published to METRICS_DIR
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, histogram.buckets, histogram.counts, histogram.sum, histogram.count]
+                               for (name, labels), histogram in self.histograms.items()],
+            }
+
+    # Add another process's snapshot to this registry
+    def merge(self, snapshot):
+        with self.lock:
+            for name, labels, value in snapshot['counters']:
+                self.counters[(name, tuple(tuple(label) for label in labels))] += value
+            for name, labels, buckets, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(tuple(buckets))
+                histogram = self.histograms[key]
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+    def render(self):
+        lines = []
+        with self.lock:
+            described = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"dash_callback_{name}_total"
+                if metric not in described:
+                    lines += [f"# HELP {metric} {COUNTERS[name]}", f"# TYPE {metric} counter"]
+                    described.add(metric)
+                lines.append(f"{metric}{{{_labels(labels)}}} {value:g}")
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                metric = f"dash_callback_{name}"
+                if metric not in described:
+                    lines += [f"# HELP {metric} Callback {name.replace('_', ' ')}", f"# TYPE {metric} histogram"]
+                    described.add(metric)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{_labels(labels + (("le", f"{bound:g}"),))}}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{_labels(labels + (("le", "+Inf"),))}}} {histogram.count}')
+                lines.append(f"{metric}_sum{{{_labels(labels)}}} {histogram.sum:g}")
+                lines.append(f"{metric}_count{{{_labels(labels)}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+callback_metrics = CallbackMetrics()
+
+_published = {'pid': None, 'changed': False}
+_publish_lock = threading.Lock()
+
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+# Write this process's snapshot to METRICS_DIR. Files of exited workers are kept, so the summed
+# counters never go backwards when gunicorn replaces a worker.
+def publish_metrics():
+    with _publish_lock:
+        _published['changed'] = False
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = _snapshot_path(os.getpid())
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(callback_metrics.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+
+def _publisher():
+    while True:
+        time.sleep(METRICS_PUBLISH_SECONDS)
+        if _published['changed']:
+            publish_metrics()
+
+
+# Mark the registry changed, starting this process's publisher thread on first use (threads do not
+# survive gunicorn's fork, so every worker starts its own)
+def _metrics_changed():
+    if not METRICS_DIR:
+        return
+    _published['changed'] = True
+    if _published['pid'] != os.getpid():
+        with _publish_lock:
+            if _published['pid'] != os.getpid():
+                _published['pid'] = os.getpid()
+                threading.Thread(target=_publisher, name="metrics-publisher", daemon=True).start()
+
+
+# Prometheus text for /metrics: every worker's published measurements summed when METRICS_DIR is
+# set (this worker's own are published first, so they are current), this process's otherwise
+def render_metrics():
+    if not METRICS_DIR:
+        return callback_metrics.render()
+    publish_metrics()
+    merged = CallbackMetrics()
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        try:
+            with open(path) as f:
+                merged.merge(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return merged.render()
+
+
+# Hotel filter value as a metric label: a hotel in the data or "All", anything else is "other"
+def hotel_metric_label(value):
+    from components import plots
+    if value == "All" or (isinstance(value, str) and value in plots.hotels_for("All")):
+        return value
+    return OTHER_HOTEL_LABEL
+
+
+# Measurements of the background job running in this process (see recording())
+_job = {'recorder': None}
+
+
+def _new_recorder():
+    return {
+        'started': time.perf_counter(),
+        'depth': 0,
+        'phases': defaultdict(float),
+        'counts': defaultdict(int),
+        'callback': None,
+    }
+
+
+# Measurements of the callback running in the current background job or request, or None outside of
+# one. The job is checked first: it is forked from a worker serving a request and still sees that request.
+def _recorder():
+    if _job['recorder'] is not None:
+        return _job['recorder']
+    if has_request_context():
+        return g.get('callback_metrics')
+    return None
+
+
+# Measure the callback run by a background job, which has no request of its own. The job hands the
+# recorder to the worker that delivers its result (adopt_recorder).
+@contextmanager
+def recording():
+    _job['recorder'] = _new_recorder()
+    try:
+        yield _job['recorder']
+    finally:
+        _job['recorder'] = None
+
+
+# Record a background job's measurements with the request that delivers its result: the callback,
+# its phases and cache counts come from the job, the time from dispatch until the job started
+# building is its queue wait (process start and build slot), and the duration runs from the
+# dispatch to this response, including the browser's polling delay
+def adopt_recorder(job_recorder, dispatched):
+    recorder = _recorder()
+    if recorder is None or not job_recorder['callback']:
+        return
+    for key in ['callback', 'hotel', 'phases', 'callback_seconds']:
+        if key in job_recorder:
+            recorder[key] = job_recorder[key]
+    for event, amount in job_recorder['counts'].items():
+        recorder['counts'][event] += amount
+    recorder['queue_seconds'] = max(job_recorder['building'] - dispatched, 0.0)
+    recorder['waited_seconds'] = max(time.time() - dispatched - (time.perf_counter() - recorder['started']), 0.0)
+
+
+# Time a section as `name`; sections nested in another timed section count toward the outer one
+@contextmanager
+def phase(name):
+    recorder = _recorder()
+    if recorder is None or recorder['depth']:
+        yield
+        return
+    recorder['depth'] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder['phases'][name] += time.perf_counter() - start
+        recorder['depth'] -= 1
+
+
+def timed(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Count an event (cache_hits, cache_misses, errors) for the running callback
+def count(event):
+    recorder = _recorder()
+    if recorder is not None:
+        recorder['counts'][event] += 1
+
+
+# Wrap a page callback so its request is measured; the first argument is the hotel filter
+def instrument(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        recorder = _recorder()
+        if recorder is None:
+            return func(*args, **kwargs)
+        recorder.update(callback=func.__name__, hotel=hotel_metric_label(args[0]) if args else "")
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            recorder['counts']['errors'] += 1
+            raise
+        finally:
+            recorder['callback_seconds'] = time.perf_counter() - start
+    return wrapper
+
+
+def _start_request():
+    if request.path.endswith("/_dash-update-component"):
+        g.callback_metrics = _new_recorder()
+
+
+# Fold the request's measurements into the registry once the response is encoded
+def _finish_request(response):
+    recorder = g.pop('callback_metrics', None)
+    if not recorder or not recorder['callback']:
+        return response
+    request_seconds = time.perf_counter() - recorder['started']
+    total = request_seconds + recorder.get('waited_seconds', 0.0)
+    phases = recorder['phases']
+    callback_seconds = recorder.get('callback_seconds', total)
+    # The callback of a background job ran in the job, so all of this request is encoding the result
+    local_callback_seconds = 0.0 if 'queue_seconds' in recorder else callback_seconds
+    measured = {
+        'filter': phases['filter'],
+        'aggregate': phases['aggregate'],
+        'figure': max(callback_seconds - phases['filter'] - phases['aggregate'] - phases['serialize'], 0.0),
+        'serialize': phases['serialize'] + max(request_seconds - local_callback_seconds, 0.0),
+    }
+    labels = (("callback", recorder['callback']), ("hotel", recorder['hotel']))
+    for name in PHASES:
+        callback_metrics.observe("phase_seconds", labels + (("phase", name),), measured[name])
+    callback_metrics.observe("duration_seconds", labels, total)
+    if 'queue_seconds' in recorder:
+        callback_metrics.observe("queue_seconds", labels, recorder['queue_seconds'])
+    callback_metrics.observe("response_bytes", labels, response.calculate_content_length() or 0, BYTES_BUCKETS)
+    callback_metrics.inc('requests', labels)
+    if response.status_code >= 500 and not recorder['counts']['errors']:
+        recorder['counts']['errors'] += 1
+    for event, amount in recorder['counts'].items():
+        callback_metrics.inc(event, labels, amount)
+    _metrics_changed()
+    return response
+
+
+# Measure every Dash callback request served by `server`
+def install_request_hooks(server):
+    server.before_request(_start_request)
+    server.after_request(_finish_request)
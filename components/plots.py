@@ -1,29 +1,204 @@
-import pandas as pd
-import plotly.express as px
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import plotly
 import plotly.graph_objects as go
+from plotly.colors import qualitative
+from components.dataset import load_cube, load_dataset, load_manifest, load_orders
+from components.cube import CUBE_MEASURES
+from components.filters import FilterIndex
+from components.metrics import count
+from components.serialize import array, trim
+from components.stats import bin_edges, box_stats, density_cells, sorted_histogram, systematic_sample
+from components import serialize, templates
 
-# Load the dataset with error handling
-try:
-    df = pd.read_csv("cleaned_hotel_bookings.csv")
-    df['arrival_date'] = pd.to_datetime(df['arrival_date'])
-    df['total_stay'] = df['stays_in_weekend_nights'] + df['stays_in_week_nights']
-    df['revenue'] = df['adr'] * df['total_stay']
-except FileNotFoundError:
-    raise FileNotFoundError("The file 'cleaned_hotel_bookings.csv' was not found. Please ensure it is in the project directory.")
-except Exception as e:
-    raise Exception(f"Error loading dataset: {str(e)}")
-
-# Verify required columns exist
-required_columns = ['hotel', 'lead_time', 'arrival_date', 'stays_in_weekend_nights', 'stays_in_week_nights', 'adr', 'market_segment', 'is_canceled']
-missing_columns = [col for col in required_columns if col not in df.columns]
-if missing_columns:
-    raise ValueError(f"Dataset is missing required columns: {missing_columns}")
+MONTH_ORDER = ['January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December']
 
 # Custom color mapping for accessibility and consistency
 COLOR_MAP = {
     "Resort Hotel": "#1E90FF",  # Dodger Blue
     "City Hotel": "#FF4500"     # OrangeRed
 }
+# Colors for properties without a fixed entry above, assigned in name order
+HOTEL_PALETTE = qualitative.Dark24
+# Market segment colors, assigned in order of appearance
+SEGMENT_PALETTE = qualitative.Set2
+
+# Above this many properties, "All" is drawn as one combined series instead of one per hotel
+MAX_HOTEL_SERIES = int(os.environ.get("MAX_HOTEL_SERIES", 12))
+ALL_HOTELS_LABEL = "All Hotels"
+ALL_HOTELS_COLOR = "#555555"
+
+# "binned" computes the lead time histogram and box statistics server-side; "raw" ships every row to Plotly
+LEAD_TIME_MODE = os.environ.get("LEAD_TIME_MODE", "binned")
+LEAD_TIME_BINS = 50
+
+# "precomputed" sends per-group quartiles and a capped outlier sample; "raw" ships every row to Plotly
+BOX_MODE = os.environ.get("BOX_MODE", "precomputed")
+BOX_MAX_OUTLIERS = 200
+# Precomputed box statistics sent per box, rounded like lead times
+BOX_STATS = ['q1', 'median', 'q3', 'lowerfence', 'upperfence', 'mean']
+
+# ADR scatter rendering: SVG up to SCATTER_GL_THRESHOLD points, WebGL up to SCATTER_DENSITY_THRESHOLD,
+# then a revenue-weighted density grid plus a stratified hover sample
+SCATTER_GL_THRESHOLD = int(os.environ.get("SCATTER_GL_THRESHOLD", 1000))
+SCATTER_DENSITY_THRESHOLD = int(os.environ.get("SCATTER_DENSITY_THRESHOLD", 50000))
+SCATTER_ADR_BINS = 60
+SCATTER_HOVER_SAMPLE = 2000
+
+# Modules whose code shapes the rendered charts: the builders and every module they import
+CHART_MODULES = ['plots', 'templates', 'serialize', 'stats', 'cube', 'filters', 'dataset', 'metrics']
+
+# Hash of the chart code, the Plotly version and the settings that change the builders' output.
+# Cached figures and exports are keyed on it, so neither outlives a deploy or a configuration change.
+@lru_cache(maxsize=None)
+def render_fingerprint():
+    digest = hashlib.sha256()
+    for name in CHART_MODULES:
+        with open(os.path.join(os.path.dirname(__file__), f"{name}.py"), 'rb') as f:
+            digest.update(f.read())
+    settings = [plotly.__version__, serialize.TYPED_ARRAYS, serialize.COLUMN_PRECISION, MAX_HOTEL_SERIES, LEAD_TIME_MODE,
+                BOX_MODE, SCATTER_GL_THRESHOLD, SCATTER_DENSITY_THRESHOLD]
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+# The live dataset: rows, per-hotel filter index, aggregate cube and dataset version.
+# Nothing is read at import; the first builder call (or preload()) loads it from the
+# memory-mapped columnar cache, which is rebuilt only when the CSV changes.
+LiveData = namedtuple('LiveData', ['df', 'filter_index', 'cube', 'version'])
+_live = None
+_live_lock = threading.Lock()
+# Seconds spent in each loading step, filled in by the first load
+load_timings = {}
+
+def data():
+    return _live if _live is not None else preload()
+
+# Load the dataset now, e.g. in a gunicorn master before it forks its workers (gunicorn.conf.py)
+# so they share the loaded pages copy-on-write instead of each loading its own
+def preload():
+    global _live
+    with _live_lock:
+        if _live is None:
+            started = time.perf_counter()
+            # One manifest for every step, so a cache rebuilt meanwhile cannot mix two builds
+            manifest = load_manifest()
+            df = load_dataset(manifest=manifest)
+            load_timings['dataset'] = time.perf_counter() - started
+            started = time.perf_counter()
+            filter_index = FilterIndex(df, orders=load_orders(manifest=manifest))
+            load_timings['filter_index'] = time.perf_counter() - started
+            started = time.perf_counter()
+            cube = load_cube(manifest=manifest)
+            load_timings['cube'] = time.perf_counter() - started
+            _live = LiveData(df, filter_index, cube, df.attrs['version'])
+    return _live
+
+# Module attributes df, filter_index, cube and dataset_version read the live dataset
+def __getattr__(name):
+    if name == 'dataset_version':
+        return data().version
+    if name in ('df', 'filter_index', 'cube'):
+        return getattr(data(), name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+# Swap in a new dataset (used by incremental ingestion) as one object, so figures cached
+# under the new version are always built from the new data
+def replace_dataset(new_df, new_filter_index, new_cube, version):
+    global _live
+    _live = LiveData(new_df, new_filter_index, new_cube, version)
+
+# Hotels to draw for a selection, in legend order
+def hotels_for(hotel_type=None):
+    if hotel_type and hotel_type != "All":
+        return [hotel_type]
+    return sorted(data().filter_index.hotels, key=lambda hotel: (hotel not in COLOR_MAP, list(COLOR_MAP).index(hotel) if hotel in COLOR_MAP else 0, hotel))
+
+# Hotel selections drawn as separate series; "All" stands for the combined series
+def hotel_series(hotel_type=None):
+    hotels = hotels_for(hotel_type)
+    if (not hotel_type or hotel_type == "All") and len(hotels) > MAX_HOTEL_SERIES:
+        return ["All"]
+    return hotels
+
+def hotel_label(hotel):
+    return ALL_HOTELS_LABEL if hotel == "All" else hotel
+
+# Palette color of a property without a fixed color, picked by a hash of its name so it keeps
+# its color when other properties are added (two properties may share one)
+def palette_color(hotel):
+    return HOTEL_PALETTE[int(hashlib.sha1(hotel.encode()).hexdigest(), 16) % len(HOTEL_PALETTE)]
+
+# Color per series label: fixed colors first, then the palette for every other property
+def hotel_colors():
+    colors = dict(COLOR_MAP)
+    for hotel in data().filter_index.hotels:
+        if hotel not in COLOR_MAP:
+            colors[hotel] = palette_color(hotel)
+    colors[ALL_HOTELS_LABEL] = ALL_HOTELS_COLOR
+    return colors
+
+def hotel_color(hotel):
+    return hotel_colors().get(hotel_label(hotel))
+
+# Hotel filter dropdown options for the properties present in the data
+def hotel_options():
+    return [{"label": "All", "value": "All"}] + [{"label": hotel, "value": hotel} for hotel in hotels_for("All")]
+
+# Rows with the hotel column relabeled when "All" is drawn as one combined series
+def series_frame(frame, hotel_type=None):
+    if hotel_series(hotel_type) == ["All"]:
+        return frame.assign(hotel=ALL_HOTELS_LABEL)
+    return frame
+
+# Cube totals split by hotel, or by the combined series served from the hotel-merged cells
+def hotel_totals(by, hotel_type=None, measures=CUBE_MEASURES):
+    if hotel_series(hotel_type) == ["All"]:
+        totals = data().cube.totals([col for col in by if col != 'hotel'], "All", measures)
+        totals['hotel'] = ALL_HOTELS_LABEL
+        return totals
+    return data().cube.totals(by, hotel_type, measures)
+
+# Tables behind the monthly and market segment charts, also served by the aggregates API (components/api.py).
+# Each has one row per output point; values are rounded like the chart values but kept in float64,
+# the charts narrow them when packing their arrays.
+def stay_duration_table(hotel_type=None):
+    totals = hotel_totals(['month', 'hotel'], hotel_type, ['count', 'stay_sum'])
+    totals['average_stay'] = trim('total_stay', totals['stay_sum'] / totals['count'], narrow=False)
+    return totals[['hotel', 'month', 'count', 'average_stay']]
+
+def market_segment_table(hotel_type=None):
+    totals = hotel_totals(['hotel', 'market_segment'], hotel_type, ['count'])
+    totals['share'] = totals['count'] / totals.groupby('hotel', observed=True)['count'].transform('sum')
+    return totals
+
+def cancellation_rate_table(hotel_type=None):
+    totals = hotel_totals(['month', 'hotel'], hotel_type, ['count', 'canceled'])
+    totals['cancellation_rate'] = trim('is_canceled', totals['canceled'] / totals['count'], narrow=False)
+    return totals[['hotel', 'month', 'count', 'canceled', 'cancellation_rate']]
+
+def revenue_table(hotel_type=None):
+    totals = data().cube.totals(['year_month', 'market_segment'], hotel_type, ['revenue_sum'])
+    totals['revenue'] = trim('revenue', totals['revenue_sum'], narrow=False)
+    return totals[['year_month', 'market_segment', 'revenue']]
+
+# Rows per series value in order of first appearance, the order Plotly Express draws traces in
+def series_groups(frame, column='hotel'):
+    return frame.groupby(column, sort=False, observed=True)
+
+# Labels for the integer calendar keys, applied to aggregated output rows only
+def month_labels(months):
+    return [MONTH_ORDER[month - 1] for month in months]
+
+def year_month_labels(year_months):
+    return [f"{1970 + year_month // 12}-{year_month % 12 + 1:02d}" for year_month in year_months]
 
 # Helper function to create an empty plot with a message
 def create_empty_plot(message):
@@ -43,19 +218,26 @@ def create_empty_plot(message):
     )
     return fig
 
+# Figure shown in place of a chart whose builder failed. The figure cache and the warm-up do not
+# store it, so the next request builds the chart again.
+class ErrorFigure(go.Figure):
+    pass
+
+# Error figure for a builder that failed; the failure is counted in the callback metrics
+def error_plot(e):
+    count('errors')
+    return ErrorFigure(create_empty_plot(f"Error generating plot: {str(e)}"))
+
 # Plot 1: Lead Time Distribution
-def lead_time_distribution(hotel_type=None, lead_time_range=None):
-    filtered_df = df.copy()
+def lead_time_distribution(hotel_type=None, lead_time_range=None, mode=None):
+    if (mode or LEAD_TIME_MODE) == "binned":
+        return lead_time_distribution_binned(hotel_type, lead_time_range)
     try:
-        if hotel_type and hotel_type != "All":
-            filtered_df = filtered_df[filtered_df['hotel'] == hotel_type]
-        if lead_time_range:
-            filtered_df = filtered_df[
-                (filtered_df['lead_time'] >= lead_time_range[0]) &
-                (filtered_df['lead_time'] <= lead_time_range[1])
-            ]
+        filtered_df = series_frame(data().filter_index.take(['hotel', 'lead_time'], hotel_type, lead_time=lead_time_range), hotel_type)
         if filtered_df.empty:
             return create_empty_plot("No data available for the selected filters.")
+        # Plotly Express is only imported by the raw modes, keeping it out of the app's startup
+        import plotly.express as px
         fig = px.histogram(
             filtered_df,
             x="lead_time",
@@ -65,7 +247,8 @@ def lead_time_distribution(hotel_type=None, lead_time_range=None):
             labels={"lead_time": "Lead Time (Days)", "hotel": "Hotel Type"},
             marginal="box",
             opacity=0.7,
-            color_discrete_map=COLOR_MAP
+            category_orders={"hotel": [hotel_label(hotel) for hotel in hotel_series(hotel_type)]},
+            color_discrete_map=hotel_colors()
         )
         fig.update_layout(
             bargap=0.2,
@@ -79,124 +262,192 @@ def lead_time_distribution(hotel_type=None, lead_time_range=None):
         )
         return fig
     except Exception as e:
-        return create_empty_plot(f"Error generating plot: {str(e)}")
+        return error_plot(e)
+
+# Plot 1 (binned): 50 pre-computed bins plus a pre-computed marginal box per hotel,
+# so the figure size does not depend on the number of bookings
+def lead_time_distribution_binned(hotel_type=None, lead_time_range=None):
+    try:
+        groups = {hotel: data().filter_index.sorted_values('lead_time', hotel, lead_time_range) for hotel in hotel_series(hotel_type)}
+        groups = {hotel: values for hotel, values in groups.items() if len(values)}
+        if not groups:
+            return create_empty_plot("No data available for the selected filters.")
+        edges = bin_edges(groups.values(), LEAD_TIME_BINS)
+        centers = array(trim('lead_time', (edges[:-1] + edges[1:]) / 2))
+        ranges = array(trim('lead_time', np.column_stack([edges[:-1], edges[1:]])))
+        traces = []
+        for hotel, values in groups.items():
+            color = hotel_color(hotel)
+            name = hotel_label(hotel)
+            traces.append(templates.trace('lead_time', 'bar', name,
+                                          x=centers, y=array(sorted_histogram(values, edges)), customdata=ranges, marker=dict(color=color)))
+            stats = box_stats(values)
+            traces.append(templates.trace('lead_time', 'box', name,
+                                          y=[name], x=[stats['outliers'].tolist()], marker=dict(color=color),
+                                          **{key: [trim('lead_time', stats[key])] for key in BOX_STATS}))
+        return templates.figure('lead_time', traces, **lead_time_binned_layout([hotel_label(hotel) for hotel in groups]))
+    except Exception as e:
+        return error_plot(e)
+
+# Layout of the binned lead time figure, also shipped to the browser for clientside rendering
+# (plain nested dicts, so it is valid plotly.js JSON as-is)
+def lead_time_binned_layout(hotels):
+    return templates.layout('lead_time', yaxis2=dict(categoryarray=list(hotels)))
+
+# Bookings per lead time day and hotel, shipped once per hotel selection so the
+# lead time slider can re-bin in the browser
+def lead_time_aggregates(hotel_type=None):
+    hotels = []
+    for hotel in hotel_series(hotel_type):
+        values = data().filter_index.sorted_values('lead_time', hotel)
+        if len(values):
+            hotels.append({'name': hotel_label(hotel), 'color': hotel_color(hotel), 'counts': np.bincount(values).tolist()})
+    return {
+        'hotels': hotels,
+        'bins': LEAD_TIME_BINS,
+        'layout': lead_time_binned_layout([hotel['name'] for hotel in hotels]),
+    }
 
 # Plot 2: Stay Duration Patterns
 def stay_duration_patterns(hotel_type=None):
-    filtered_df = df.copy()
     try:
-        if hotel_type and hotel_type != "All":
-            filtered_df = filtered_df[filtered_df['hotel'] == hotel_type]
-        stay_by_month = filtered_df.groupby([filtered_df['arrival_date'].dt.strftime('%B'), 'hotel'])['total_stay'].mean().reset_index()
-        stay_by_month = stay_by_month.rename(columns={'arrival_date': 'Month'})
-        month_order = ['January', 'February', 'March', 'April', 'May', 'June',
-                       'July', 'August', 'September', 'October', 'November', 'December']
-        stay_by_month['Month'] = pd.Categorical(stay_by_month['Month'], categories=month_order, ordered=True)
-        stay_by_month = stay_by_month.sort_values(by='Month')
-        if stay_by_month.empty:
+        totals = stay_duration_table(hotel_type)
+        if totals.empty:
             return create_empty_plot("No data available for the selected filters.")
-        fig = px.bar(
-            stay_by_month,
-            x="Month",
-            y="total_stay",
-            color="hotel",
-            barmode="group",
-            title="Average Stay Duration by Month and Hotel Type",
-            labels={"total_stay": "Average Stay Length (Nights)", "hotel": "Hotel Type"},
-            color_discrete_map=COLOR_MAP
-        )
-        fig.update_layout(
-            xaxis_title="Month",
-            yaxis_title="Average Stay Length (Nights)",
-            legend_title="Hotel Type",
-            plot_bgcolor="white",
-            paper_bgcolor="white",
-            font=dict(size=12, color="#333333"),
-            showlegend=True
-        )
-        return fig
+        colors = hotel_colors()
+        traces = [
+            templates.trace('stay_duration', 'bar', hotel, offsetgroup=hotel, marker=dict(color=colors.get(hotel), pattern=dict(shape="")),
+                            x=month_labels(rows['month']), y=array(trim('total_stay', rows['average_stay'])))
+            for hotel, rows in series_groups(totals)
+        ]
+        return templates.figure('stay_duration', traces)
     except Exception as e:
-        return create_empty_plot(f"Error generating plot: {str(e)}")
+        return error_plot(e)
 
 # Plot 3: Booking Patterns by Market Segment
 def booking_patterns_market_segment(hotel_type=None):
-    filtered_df = df.copy()
     try:
-        if hotel_type and hotel_type != "All":
-            filtered_df = filtered_df[filtered_df['hotel'] == hotel_type]
-        market_segment_dist = filtered_df.groupby(['hotel', 'market_segment']).size().reset_index(name='count')
-        market_segment_dist['proportion'] = market_segment_dist.groupby('hotel')['count'].transform(lambda x: x / x.sum())
+        market_segment_dist = market_segment_table(hotel_type)
         if market_segment_dist.empty:
             return create_empty_plot("No data available for the selected filters.")
-        fig = px.bar(
-            market_segment_dist,
-            x="proportion",
-            y="hotel",
-            color="market_segment",
-            title="Proportion of Bookings by Market Segment and Hotel Type",
-            labels={"proportion": "Proportion of Bookings", "hotel": "Hotel Type", "market_segment": "Market Segment"},
-            orientation='h',
-            color_discrete_sequence=px.colors.qualitative.Set2
-        )
-        fig.update_layout(
-            xaxis_title="Proportion of Bookings",
-            yaxis_title="Hotel Type",
-            legend_title="Market Segment",
-            barmode="stack",
-            plot_bgcolor="white",
-            paper_bgcolor="white",
-            font=dict(size=12, color="#333333"),
-            showlegend=True
-        )
-        return fig
+        traces = [
+            templates.trace('market_segment', 'bar', segment, marker=dict(color=SEGMENT_PALETTE[i % len(SEGMENT_PALETTE)], pattern=dict(shape="")),
+                            x=array(rows['share']), y=rows['hotel'].tolist())
+            for i, (segment, rows) in enumerate(series_groups(market_segment_dist, 'market_segment'))
+        ]
+        return templates.figure('market_segment', traces)
     except Exception as e:
-        return create_empty_plot(f"Error generating plot: {str(e)}")
+        return error_plot(e)
 
 # Plot 4: ADR vs. Stay Length
 def adr_vs_stay_length(hotel_type=None, stay_length_range=None):
-    filtered_df = df.copy()
     try:
-        if hotel_type and hotel_type != "All":
-            filtered_df = filtered_df[filtered_df['hotel'] == hotel_type]
-        if stay_length_range:
-            filtered_df = filtered_df[
-                (filtered_df['total_stay'] >= stay_length_range[0]) &
-                (filtered_df['total_stay'] <= stay_length_range[1])
-            ]
-        if filtered_df.empty:
+        current = data()
+        positions = current.filter_index.positions(hotel_type, total_stay=stay_length_range)
+        if not len(positions):
             return create_empty_plot("No data available for the selected filters.")
-        fig = px.scatter(
-            filtered_df,
-            x="total_stay",
-            y="adr",
-            color="hotel",
-            size="revenue",
-            hover_data=["arrival_date", "is_canceled"],
-            title="ADR vs. Stay Length: Revenue Impact by Hotel Type",
-            labels={"total_stay": "Total Stay (Nights)", "adr": "Average Daily Rate ($)", "hotel": "Hotel Type"},
-            color_discrete_map=COLOR_MAP
-        )
-        fig.update_layout(
-            xaxis_title="Total Stay (Nights)",
-            yaxis_title="Average Daily Rate ($)",
-            legend_title="Hotel Type",
-            plot_bgcolor="white",
-            paper_bgcolor="white",
-            font=dict(size=12, color="#333333"),
-            showlegend=True
-        )
-        return fig
+        if len(positions) > SCATTER_DENSITY_THRESHOLD:
+            return adr_vs_stay_length_density(hotel_type, stay_length_range)
+        filtered_df = series_frame(current.df[['hotel', 'total_stay', 'adr', 'revenue', 'arrival_date', 'is_canceled']].take(positions), hotel_type)
+        revenue = trim('revenue', filtered_df['revenue'])
+        # Marker areas are scaled so the largest revenue is drawn 20 px wide, as Plotly Express does
+        sizeref = max(float(revenue.max()), 0.0) / 20 ** 2
+        trace_type = "scattergl" if len(positions) > SCATTER_GL_THRESHOLD else "scatter"
+        colors = hotel_colors()
+        traces = []
+        for hotel in [hotel_label(hotel) for hotel in hotel_series(hotel_type)]:
+            rows = (filtered_df['hotel'] == hotel).to_numpy()
+            if not rows.any():
+                continue
+            customdata = list(zip(
+                filtered_df['arrival_date'].to_numpy()[rows].astype('datetime64[D]').astype(str).tolist(),
+                filtered_df['is_canceled'].to_numpy()[rows].tolist(),
+            ))
+            traces.append(templates.trace('adr_stay', 'points', hotel, type=trace_type,
+                                          x=array(filtered_df['total_stay'].to_numpy()[rows]),
+                                          y=array(trim('adr', filtered_df['adr'].to_numpy()[rows])),
+                                          marker=dict(color=colors.get(hotel), size=array(revenue[rows]), sizemode="area", sizeref=sizeref, symbol="circle"),
+                                          customdata=customdata))
+        return templates.figure('adr_stay', traces)
+    except Exception as e:
+        return error_plot(e)
+
+# Plot 4 (density): revenue-weighted grid of stay length x ADR per hotel, with hover details
+# from a deterministic sample of bookings spread evenly over stay length
+def adr_vs_stay_length_density(hotel_type=None, stay_length_range=None):
+    try:
+        current = data()
+        groups = {hotel: current.filter_index.positions(hotel, total_stay=stay_length_range) for hotel in hotel_series(hotel_type)}
+        groups = {hotel: positions for hotel, positions in groups.items() if len(positions)}
+        if not groups:
+            return create_empty_plot("No data available for the selected filters.")
+        total_stay = current.df['total_stay'].to_numpy()
+        adr = current.df['adr'].to_numpy()
+        revenue = current.df['revenue'].to_numpy()
+        stays = np.concatenate([total_stay[positions] for positions in groups.values()])
+        rates = np.concatenate([adr[positions] for positions in groups.values()])
+        stay_edges = np.arange(stays.min(), stays.max() + 2) - 0.5
+        adr_edges = np.linspace(rates.min(), rates.max() + 1e-6, SCATTER_ADR_BINS + 1)
+        cells = {hotel: density_cells(total_stay[positions], adr[positions], np.clip(revenue[positions], 0, None), stay_edges, adr_edges)
+                 for hotel, positions in groups.items()}
+        max_revenue = max([cell[3].max() for cell in cells.values()] + [1])
+        traces = []
+        for hotel, positions in groups.items():
+            color = hotel_color(hotel)
+            name = hotel_label(hotel)
+            x, y, counts, revenue_sums = cells[hotel]
+            traces.append(templates.trace('adr_stay', 'density', name,
+                                          x=array(trim('total_stay', x)),
+                                          y=array(trim('adr', y)),
+                                          marker=dict(color=color, size=array(trim('revenue', revenue_sums)), sizemode="area", sizeref=2 * max_revenue / 20 ** 2, sizemin=2, opacity=0.6),
+                                          customdata=array(trim('revenue', np.column_stack([counts, revenue_sums])))))
+            # Positions are ordered by total_stay, so an evenly spaced pick is stratified on it
+            sample = positions[systematic_sample(len(positions), SCATTER_HOVER_SAMPLE)]
+            customdata = list(zip(
+                current.df['arrival_date'].to_numpy()[sample].astype('datetime64[D]').astype(str).tolist(),
+                current.df['is_canceled'].to_numpy()[sample].tolist(),
+                trim('revenue', revenue[sample], narrow=False).tolist(),
+            ))
+            traces.append(templates.trace('adr_stay', 'sample', name,
+                                          x=array(total_stay[sample]), y=array(adr[sample]),
+                                          marker=dict(color=color, size=3, opacity=0.5), customdata=customdata))
+        return templates.figure('adr_stay', traces)
     except Exception as e:
-        return create_empty_plot(f"Error generating plot: {str(e)}")
+        return error_plot(e)
+
+# Bookings, ADR and revenue sums per stay length and hotel, shipped once per hotel selection so
+# the stay length slider can filter in the browser (drawn as mean ADR per stay length)
+def stay_length_aggregates(hotel_type=None):
+    current = data()
+    total_stay = current.df['total_stay'].to_numpy()
+    adr = current.df['adr'].to_numpy()
+    revenue = current.df['revenue'].to_numpy()
+    hotels = []
+    for hotel in hotel_series(hotel_type):
+        positions = current.filter_index.positions(hotel)
+        if len(positions):
+            stays = total_stay[positions]
+            hotels.append({
+                'name': hotel_label(hotel),
+                'color': hotel_color(hotel),
+                'counts': np.bincount(stays).tolist(),
+                'adr_sums': trim('adr', np.bincount(stays, weights=adr[positions]), narrow=False).tolist(),
+                'revenue_sums': trim('revenue', np.bincount(stays, weights=revenue[positions]), narrow=False).tolist(),
+            })
+    return {
+        'hotels': hotels,
+        'layout': templates.layout('adr_stay'),
+    }
 
 # Plot 5: Cancellations by Lead Time and Hotel Type
-def cancellations_by_lead_time(hotel_type=None):
-    filtered_df = df.copy()
+def cancellations_by_lead_time(hotel_type=None, mode=None):
+    if (mode or BOX_MODE) == "precomputed":
+        return cancellations_by_lead_time_precomputed(hotel_type)
     try:
-        if hotel_type and hotel_type != "All":
-            filtered_df = filtered_df[filtered_df['hotel'] == hotel_type]
+        filtered_df = series_frame(data().filter_index.take(['hotel', 'is_canceled', 'lead_time'], hotel_type), hotel_type)
         if filtered_df.empty:
             return create_empty_plot("No data available for the selected filters.")
+        import plotly.express as px
         fig = px.box(
             filtered_df,
             x="is_canceled",
@@ -204,8 +455,8 @@ def cancellations_by_lead_time(hotel_type=None):
             color="hotel",
             title="Lead Time Distribution by Cancellation Status and Hotel Type",
             labels={"is_canceled": "Canceled (0 = No, 1 = Yes)", "lead_time": "Lead Time (Days)", "hotel": "Hotel Type"},
-            category_orders={"is_canceled": [0, 1]},
-            color_discrete_map=COLOR_MAP
+            category_orders={"is_canceled": [0, 1], "hotel": [hotel_label(hotel) for hotel in hotel_series(hotel_type)]},
+            color_discrete_map=hotel_colors()
         )
         fig.update_layout(
             xaxis_title="Cancellation Status",
@@ -218,112 +469,69 @@ def cancellations_by_lead_time(hotel_type=None):
         )
         return fig
     except Exception as e:
-        return create_empty_plot(f"Error generating plot: {str(e)}")
+        return error_plot(e)
+
+# Plot 5 (precomputed): box statistics per hotel and cancellation status computed server-side
+def cancellations_by_lead_time_precomputed(hotel_type=None):
+    try:
+        traces = []
+        for hotel in hotel_series(hotel_type):
+            groups = data().filter_index.sorted_groups('lead_time', 'is_canceled', hotel)
+            if not groups:
+                continue
+            statuses = [status for status in [0, 1] if status in groups]
+            stats = [box_stats(groups[status], BOX_MAX_OUTLIERS) for status in statuses]
+            name = hotel_label(hotel)
+            traces.append(templates.trace('cancellations', 'box', name, offsetgroup=name, marker=dict(color=hotel_color(hotel)),
+                                          x=statuses, y=[s['outliers'].tolist() for s in stats],
+                                          **{key: [trim('lead_time', s[key]) for s in stats] for key in BOX_STATS}))
+        if not traces:
+            return create_empty_plot("No data available for the selected filters.")
+        return templates.figure('cancellations', traces)
+    except Exception as e:
+        return error_plot(e)
 
 # Plot 6: Cancellation Trends by Month
 def cancellation_trends_by_month(hotel_type=None):
-    filtered_df = df.copy()
     try:
-        if hotel_type and hotel_type != "All":
-            filtered_df = filtered_df[filtered_df['hotel'] == hotel_type]
-        cancel_by_month = filtered_df.groupby([filtered_df['arrival_date'].dt.strftime('%B'), 'hotel'])['is_canceled'].mean().reset_index()
-        cancel_by_month = cancel_by_month.rename(columns={'arrival_date': 'Month', 'is_canceled': 'Cancellation Rate'})
-        month_order = ['January', 'February', 'March', 'April', 'May', 'June',
-                       'July', 'August', 'September', 'October', 'November', 'December']
-        cancel_by_month['Month'] = pd.Categorical(cancel_by_month['Month'], categories=month_order, ordered=True)
-        cancel_by_month = cancel_by_month.sort_values('Month')
-        if cancel_by_month.empty:
+        totals = cancellation_rate_table(hotel_type)
+        if totals.empty:
             return create_empty_plot("No data available for the selected filters.")
-        fig = px.line(
-            cancel_by_month,
-            x="Month",
-            y="Cancellation Rate",
-            color="hotel",
-            title="Cancellation Rate by Month and Hotel Type",
-            labels={"Cancellation Rate": "Cancellation Rate", "hotel": "Hotel Type"},
-            color_discrete_map=COLOR_MAP
-        )
-        fig.update_layout(
-            xaxis_title="Month",
-            yaxis_title="Cancellation Rate",
-            legend_title="Hotel Type",
-            plot_bgcolor="white",
-            paper_bgcolor="white",
-            font=dict(size=12, color="#333333"),
-            showlegend=True
-        )
-        return fig
+        colors = hotel_colors()
+        traces = [
+            templates.trace('cancellation_trends', 'line', hotel, line=dict(color=colors.get(hotel), dash="solid"),
+                            x=month_labels(rows['month']), y=array(trim('is_canceled', rows['cancellation_rate'])))
+            for hotel, rows in series_groups(totals)
+        ]
+        return templates.figure('cancellation_trends', traces)
     except Exception as e:
-        return create_empty_plot(f"Error generating plot: {str(e)}")
+        return error_plot(e)
 
 # Plot 7: Heatmap of Booking Trends by Month and Year
 def booking_trends_heatmap(hotel_type=None):
-    filtered_df = df.copy()
     try:
-        if hotel_type and hotel_type != "All":
-            filtered_df = filtered_df[filtered_df['hotel'] == hotel_type]
-        # Extract year and month
-        filtered_df['year'] = filtered_df['arrival_date'].dt.year
-        filtered_df['month'] = filtered_df['arrival_date'].dt.strftime('%B')
-        month_order = ['January', 'February', 'March', 'April', 'May', 'June',
-                       'July', 'August', 'September', 'October', 'November', 'December']
         # Aggregate bookings by year and month
-        heatmap_data = filtered_df.groupby(['year', 'month']).size().reset_index(name='booking_count')
-        heatmap_data['month'] = pd.Categorical(heatmap_data['month'], categories=month_order, ordered=True)
-        heatmap_data = heatmap_data.sort_values(['year', 'month'])
-        if heatmap_data.empty:
+        totals = data().cube.totals(['year', 'month'], hotel_type, ['count'])
+        if totals.empty:
             return create_empty_plot("No data available for the selected filters.")
-        fig = px.density_heatmap(
-            heatmap_data,
-            x="month",
-            y="year",
-            z="booking_count",
-            color_continuous_scale='Blues',
-            title="Booking Trends by Month and Year",
-            labels={"month": "Month", "year": "Year", "booking_count": "Number of Bookings"},
-            text_auto=True
-        )
-        fig.update_layout(
-            xaxis_title="Month",
-            yaxis_title="Year",
-            plot_bgcolor="white",
-            paper_bgcolor="white",
-            font=dict(size=12, color="#333333"),
-            showlegend=True
-        )
-        return fig
+        return templates.figure('heatmap', [
+            templates.trace('heatmap', 'cells', x=month_labels(totals['month']), y=array(totals['year']), z=array(totals['count']))
+        ])
     except Exception as e:
-        return create_empty_plot(f"Error generating plot: {str(e)}")
+        return error_plot(e)
 
 # Plot 8: Stacked Area Chart of Revenue Contribution by Market Segment
 def revenue_by_market_segment(hotel_type=None):
-    filtered_df = df.copy()
     try:
-        if hotel_type and hotel_type != "All":
-            filtered_df = filtered_df[filtered_df['hotel'] == hotel_type]
         # Aggregate revenue by market segment over time
-        filtered_df['year_month'] = filtered_df['arrival_date'].dt.to_period('M').astype(str)
-        revenue_data = filtered_df.groupby(['year_month', 'market_segment'])['revenue'].sum().reset_index()
-        if revenue_data.empty:
+        totals = revenue_table(hotel_type)
+        if totals.empty:
             return create_empty_plot("No data available for the selected filters.")
-        fig = px.area(
-            revenue_data,
-            x="year_month",
-            y="revenue",
-            color="market_segment",
-            title="Revenue Contribution by Market Segment Over Time",
-            labels={"year_month": "Year-Month", "revenue": "Revenue ($)", "market_segment": "Market Segment"},
-            color_discrete_sequence=px.colors.qualitative.Set2
-        )
-        fig.update_layout(
-            xaxis_title="Year-Month",
-            yaxis_title="Revenue ($)",
-            legend_title="Market Segment",
-            plot_bgcolor="white",
-            paper_bgcolor="white",
-            font=dict(size=12, color="#333333"),
-            showlegend=True
-        )
-        return fig
+        traces = [
+            templates.trace('revenue', 'area', segment, line=dict(color=SEGMENT_PALETTE[i % len(SEGMENT_PALETTE)]),
+                            x=year_month_labels(rows['year_month']), y=array(trim('revenue', rows['revenue'])))
+            for i, (segment, rows) in enumerate(series_groups(totals, 'market_segment'))
+        ]
+        return templates.figure('revenue', traces)
     except Exception as e:
-        return create_empty_plot(f"Error generating plot: {str(e)}")
\ No newline at end of file
+        return error_plot(e)
\ No newline at end of file
@@ -0,0 +1,113 @@
+import base64
+import json
+import os
+
+import numpy as np
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# "1" ships numeric trace data as base64 typed arrays (what plotly emits for NumPy arrays);
+# "0" turns them back into plain JSON lists for clients that cannot decode them
+TYPED_ARRAYS = os.environ.get("TYPED_ARRAYS", "1") == "1"
+
+# Decimal places kept for values derived from each column, e.g. COLUMN_PRECISION="adr=2,revenue=0"
+COLUMN_PRECISION = {'adr': 2, 'revenue': 2, 'lead_time': 2, 'total_stay': 2, 'is_canceled': 4}
+COLUMN_PRECISION.update({
+    column: int(decimals)
+    for column, decimals in (item.split("=") for item in os.environ.get("COLUMN_PRECISION", "").split(",") if item)
+})
+
+
+# Round values derived from `column` to its configured precision. Scalars come back as floats;
+# arrays are narrowed to float32 when `narrow` is set and that loses nothing at this precision,
+# which halves their size as typed arrays.
+def trim(column, values, narrow=TYPED_ARRAYS):
+    decimals = COLUMN_PRECISION.get(column)
+    if np.ndim(values) == 0:
+        return values if decimals is None else round(float(values), decimals)
+    values = np.asarray(values)
+    if decimals is None or values.dtype.kind != 'f':
+        return values
+    values = values.astype('float64').round(decimals)
+    if narrow and len(values):
+        narrowed = values.astype('float32')
+        if np.nanmax(np.abs(narrowed - values)) <= 0.5 * 10 ** -decimals:
+            return narrowed
+    return values
+
+
+# plotly.js typed array codes of the NumPy dtypes it can decode
+TYPED_ARRAY_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8',
+}
+
+
+# Base64 typed array spec ({"dtype", "bdata"[, "shape"]}) as plotly emits for a NumPy array, or None
+# for arrays plotly.js cannot take that way. 64-bit integers are narrowed to the smallest type
+# holding their values, since plotly.js has no 64-bit integer arrays.
+def typed_array(values):
+    if not values.size:
+        return None
+    if values.dtype.kind in 'iu' and values.dtype.itemsize == 8:
+        low, high = values.min(), values.max()
+        for dtype in (['int8', 'int16', 'int32'] if values.dtype.kind == 'i' else ['uint8', 'uint16', 'uint32']):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                values = values.astype(dtype)
+                break
+    code = TYPED_ARRAY_DTYPES.get(str(values.dtype))
+    if code is None:
+        return None
+    spec = {'dtype': code, 'bdata': base64.b64encode(np.ascontiguousarray(values)).decode('ascii')}
+    if values.ndim > 1:
+        spec['shape'] = str(values.shape)[1:-1]
+    return spec
+
+
+# Numeric data for figures built as plain dicts (which skip plotly's validators): the same
+# typed array plotly would emit for a NumPy array, or a plain list when TYPED_ARRAYS is off
+def array(values):
+    values = np.asarray(values)
+    if TYPED_ARRAYS and values.dtype.kind in 'iuf':
+        spec = typed_array(values)
+        if spec is not None:
+            return spec
+    return values.tolist()
+
+
+# Replace {"dtype", "bdata"} typed arrays with plain lists
+def _plain_arrays(value):
+    if isinstance(value, dict):
+        if 'bdata' in value and 'dtype' in value:
+            array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+            if 'shape' in value:
+                array = array.reshape([int(size) for size in str(value['shape']).split(",")])
+            return array.tolist()
+        return {key: _plain_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain_arrays(item) for item in value]
+    return value
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data)
+
+
+def loads(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+# JSON for a figure. Figures are validated when they are built, so validation is skipped here.
+def figure_json(fig):
+    payload = pio.to_json(fig, validate=False, engine="orjson" if orjson is not None else "json")
+    if not TYPED_ARRAYS and '"bdata"' in payload:
+        payload = dumps(_plain_arrays(loads(payload)))
+    return payload
@@ -0,0 +1,77 @@
+import numpy as np
+
+from components.metrics import timed
+
+# Vectorized summary statistics for server-side binning. Inputs must be sorted ascending,
+# which is what FilterIndex.sorted_values returns, so every lookup is a binary search.
+
+
+# Interpolated percentile of an ascending array (NumPy's default "linear" method)
+def sorted_percentile(sorted_values, q):
+    pos = (len(sorted_values) - 1) * q
+    lo = int(np.floor(pos))
+    hi = min(lo + 1, len(sorted_values) - 1)
+    low_value = float(sorted_values[lo])
+    return low_value + (float(sorted_values[hi]) - low_value) * (pos - lo)
+
+
+# Shared bin edges covering every group
+@timed("aggregate")
+def bin_edges(groups, nbins):
+    lows = [float(values[0]) for values in groups if len(values)]
+    highs = [float(values[-1]) for values in groups if len(values)]
+    low, high = min(lows), max(highs)
+    if high == low:
+        high = low + 1
+    return np.linspace(low, high, nbins + 1)
+
+
+# Counts per bin; the last bin includes its right edge like np.histogram
+@timed("aggregate")
+def sorted_histogram(sorted_values, edges):
+    bounds = np.searchsorted(sorted_values, edges, side='left')
+    bounds[-1] = np.searchsorted(sorted_values, edges[-1], side='right')
+    return np.diff(bounds)
+
+
+# Quartiles, Tukey whiskers and an evenly spaced, capped sample of the outliers
+@timed("aggregate")
+def box_stats(sorted_values, max_outliers=200):
+    q1 = sorted_percentile(sorted_values, 0.25)
+    median = sorted_percentile(sorted_values, 0.5)
+    q3 = sorted_percentile(sorted_values, 0.75)
+    iqr = q3 - q1
+    start = np.searchsorted(sorted_values, q1 - 1.5 * iqr, side='left')
+    stop = np.searchsorted(sorted_values, q3 + 1.5 * iqr, side='right')
+    outliers = np.concatenate([sorted_values[:start], sorted_values[stop:]])
+    if len(outliers) > max_outliers:
+        outliers = outliers[np.linspace(0, len(outliers) - 1, max_outliers).astype(int)]
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'lowerfence': float(sorted_values[start]),
+        'upperfence': float(sorted_values[stop - 1]),
+        'mean': float(np.mean(sorted_values, dtype='float64')),
+        'count': len(sorted_values),
+        'outliers': outliers,
+    }
+
+
+# Evenly spaced positions into an array of length n; over rows ordered by a key this is a
+# deterministic sample stratified on that key
+def systematic_sample(n, size):
+    if n <= size:
+        return np.arange(n)
+    return np.linspace(0, n - 1, size).astype(int)
+
+
+# Booking counts and weight sums per 2D cell, keeping only the non-empty cells
+@timed("aggregate")
+def density_cells(x, y, weights, x_edges, y_edges):
+    counts, _, _ = np.histogram2d(x, y, bins=(x_edges, y_edges))
+    sums, _, _ = np.histogram2d(x, y, bins=(x_edges, y_edges), weights=weights)
+    ix, iy = np.nonzero(counts)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    return x_centers[ix], y_centers[iy], counts[ix, iy].astype(int), sums[ix, iy]
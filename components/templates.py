@@ -0,0 +1,202 @@
+import plotly.io as pio
+from plotly.colors import sequential
+
+# Plotly's default theme, resolved once; every figure below embeds it just like px figures do
+THEME = pio.templates[pio.templates.default].to_plotly_json()
+
+# Background, font and legend settings shared by every chart
+BASE_LAYOUT = dict(
+    font=dict(size=12, color="#333333"),
+    plot_bgcolor="white",
+    paper_bgcolor="white",
+    showlegend=True,
+)
+
+
+# Single x/y axis pair as Plotly Express lays it out
+def _axes(x_title, y_title):
+    return dict(
+        xaxis=dict(anchor="y", domain=[0.0, 1.0], title=dict(text=x_title)),
+        yaxis=dict(anchor="x", domain=[0.0, 1.0], title=dict(text=y_title)),
+    )
+
+
+def _layout(title, legend_title=None, legend=None, **settings):
+    legend = dict(tracegroupgap=0, **(legend or {}))
+    if legend_title:
+        legend['title'] = dict(text=legend_title)
+    return dict(BASE_LAYOUT, title=dict(text=title), legend=legend, **settings)
+
+
+# Layout and trace skeletons of every chart, built once at import. A trace skeleton holds the
+# attributes that do not depend on the data; "{name}" in its hovertemplate is replaced by the
+# series name. Per request only the data arrays (and per-series names and colors) are filled in.
+FIGURE_TEMPLATES = {
+    'lead_time': {
+        'layout': dict(
+            BASE_LAYOUT,
+            title=dict(text="Distribution of Booking Lead Time by Hotel Type"),
+            barmode="relative",
+            bargap=0.2,
+            xaxis=dict(title=dict(text="Lead Time (Days)"), domain=[0, 1]),
+            yaxis=dict(title=dict(text="Number of Bookings"), domain=[0, 0.7326]),
+            xaxis2=dict(matches="x", anchor="y2", showticklabels=False, showgrid=True),
+            yaxis2=dict(domain=[0.7426, 1], anchor="x2", showticklabels=False, showline=False, categoryorder="array", categoryarray=[]),
+            legend=dict(title=dict(text="Hotel Type")),
+        ),
+        'traces': {
+            'bar': dict(
+                type="bar",
+                opacity=0.7,
+                hovertemplate="Hotel Type={name}<br>Lead Time (Days)=%{customdata[0]:.0f}-%{customdata[1]:.0f}<br>count=%{y}<extra></extra>",
+            ),
+            # Outlier samples are drawn as the box points
+            'box': dict(type="box", boxpoints="outliers", orientation="h", showlegend=False, xaxis="x2", yaxis="y2"),
+        },
+    },
+    'stay_duration': {
+        'layout': _layout("Average Stay Duration by Month and Hotel Type", "Hotel Type", barmode="group",
+                          **_axes("Month", "Average Stay Length (Nights)")),
+        'traces': {
+            'bar': dict(
+                type="bar",
+                alignmentgroup="True",
+                orientation="v",
+                textposition="auto",
+                showlegend=True,
+                xaxis="x",
+                yaxis="y",
+                hovertemplate="Hotel Type={name}<br>Month=%{x}<br>Average Stay Length (Nights)=%{y}<extra></extra>",
+            ),
+        },
+    },
+    'market_segment': {
+        'layout': _layout("Proportion of Bookings by Market Segment and Hotel Type", "Market Segment", barmode="stack",
+                          **_axes("Proportion of Bookings", "Hotel Type")),
+        'traces': {
+            'bar': dict(
+                type="bar",
+                orientation="h",
+                textposition="auto",
+                showlegend=True,
+                xaxis="x",
+                yaxis="y",
+                hovertemplate="Market Segment={name}<br>Proportion of Bookings=%{x}<br>Hotel Type=%{y}<extra></extra>",
+            ),
+        },
+    },
+    'adr_stay': {
+        'layout': _layout("ADR vs. Stay Length: Revenue Impact by Hotel Type", "Hotel Type", legend=dict(itemsizing="constant"),
+                          **_axes("Total Stay (Nights)", "Average Daily Rate ($)")),
+        'traces': {
+            'points': dict(
+                mode="markers",
+                showlegend=True,
+                xaxis="x",
+                yaxis="y",
+                hovertemplate="Hotel Type={name}<br>Total Stay (Nights)=%{x}<br>Average Daily Rate ($)=%{y}<br>revenue=%{marker.size}<br>arrival_date=%{customdata[0]}<br>is_canceled=%{customdata[1]}<extra></extra>",
+            ),
+            'density': dict(
+                type="scattergl",
+                mode="markers",
+                hovertemplate="Hotel Type={name}<br>Total Stay (Nights)=%{x}<br>Average Daily Rate ($)≈%{y:.0f}<br>Bookings=%{customdata[0]}<br>Revenue=%{customdata[1]:,.0f}<extra></extra>",
+            ),
+            'sample': dict(
+                type="scattergl",
+                mode="markers",
+                showlegend=False,
+                hovertemplate="Hotel Type={name}<br>Total Stay (Nights)=%{x}<br>Average Daily Rate ($)=%{y}<br>arrival_date=%{customdata[0]}<br>is_canceled=%{customdata[1]}<br>revenue=%{customdata[2]}<extra></extra>",
+            ),
+        },
+    },
+    'cancellations': {
+        'layout': dict(BASE_LAYOUT, title=dict(text="Lead Time Distribution by Cancellation Status and Hotel Type"), boxmode="group",
+                       xaxis=dict(title=dict(text="Cancellation Status")), yaxis=dict(title=dict(text="Lead Time (Days)")),
+                       legend=dict(title=dict(text="Hotel Type"))),
+        'traces': {
+            # Outlier samples are drawn as the box points
+            'box': dict(type="box", boxpoints="outliers"),
+        },
+    },
+    'cancellation_trends': {
+        'layout': _layout("Cancellation Rate by Month and Hotel Type", "Hotel Type", **_axes("Month", "Cancellation Rate")),
+        'traces': {
+            'line': dict(
+                type="scatter",
+                mode="lines",
+                marker=dict(symbol="circle"),
+                orientation="v",
+                showlegend=True,
+                xaxis="x",
+                yaxis="y",
+                hovertemplate="Hotel Type={name}<br>Month=%{x}<br>Cancellation Rate=%{y}<extra></extra>",
+            ),
+        },
+    },
+    'heatmap': {
+        'layout': _layout("Booking Trends by Month and Year", coloraxis=dict(
+            colorbar=dict(title=dict(text="sum of Number of Bookings")),
+            colorscale=[[i / (len(sequential.Blues) - 1), color] for i, color in enumerate(sequential.Blues)],
+            autocolorscale=False,
+        ), **_axes("Month", "Year")),
+        'traces': {
+            'cells': dict(
+                type="histogram2d",
+                histfunc="sum",
+                coloraxis="coloraxis",
+                name="",
+                texttemplate="%{z}",
+                xaxis="x",
+                yaxis="y",
+                xbingroup="x",
+                ybingroup="y",
+                hovertemplate="Month=%{x}<br>Year=%{y}<br>sum of Number of Bookings=%{z}<extra></extra>",
+            ),
+        },
+    },
+    'revenue': {
+        'layout': _layout("Revenue Contribution by Market Segment Over Time", "Market Segment", **_axes("Year-Month", "Revenue ($)")),
+        'traces': {
+            'area': dict(
+                type="scatter",
+                mode="lines",
+                stackgroup="1",
+                fillpattern=dict(shape=""),
+                marker=dict(symbol="circle"),
+                orientation="v",
+                showlegend=True,
+                xaxis="x",
+                yaxis="y",
+                hovertemplate="Market Segment={name}<br>Year-Month=%{x}<br>Revenue ($)=%{y}<extra></extra>",
+            ),
+        },
+    },
+}
+
+
+# Layout of a chart; top-level keys in `overrides` are merged one level deep into the registered ones
+def layout(chart, **overrides):
+    merged = dict(FIGURE_TEMPLATES[chart]['layout'])
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = dict(merged[key], **value)
+        else:
+            merged[key] = value
+    return merged
+
+
+# One trace of a chart: its skeleton plus this request's data. `name` also sets the legend group.
+def trace(chart, kind, name=None, **data):
+    skeleton = FIGURE_TEMPLATES[chart]['traces'][kind]
+    built = dict(skeleton)
+    if name is not None:
+        built.update(name=name, legendgroup=name)
+        if 'hovertemplate' in skeleton:
+            built['hovertemplate'] = skeleton['hovertemplate'].replace("{name}", name)
+    built.update(data)
+    return built
+
+
+# Complete figure as plain plotly.js JSON data, themed like a Plotly Express figure
+def figure(chart, traces, **overrides):
+    return {'data': traces, 'layout': dict(layout(chart, **overrides), template=THEME)}
@@ -0,0 +1,112 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+from components import plots
+from components.cache import figure_cache
+from components.serialize import figure_json
+
+# Slider positions worth pre-rendering besides the defaults (first entry of each list)
+COMMON_LEAD_TIME_RANGES = [[0, 737], [0, 100], [0, 200], [0, 370]]
+COMMON_STAY_LENGTH_RANGES = [[0, 50], [0, 7], [0, 14], [1, 10]]
+
+WARMUP_TIME_BUDGET = float(os.environ.get("WARMUP_TIME_BUDGET", 60))
+WARMUP_PROCESSES = int(os.environ.get("WARMUP_PROCESSES", os.cpu_count() or 1))
+
+
+# Every (plot function, arguments) pair the page callbacks request for the common filters
+def warmup_jobs():
+    jobs = []
+    for hotel_type in ["All"] + plots.hotels_for("All"):
+        for lead_time_range in COMMON_LEAD_TIME_RANGES:
+            jobs.append(("lead_time_distribution", (hotel_type, lead_time_range)))
+        jobs.append(("stay_duration_patterns", (hotel_type,)))
+        jobs.append(("booking_patterns_market_segment", (hotel_type,)))
+        for stay_length_range in COMMON_STAY_LENGTH_RANGES:
+            jobs.append(("adr_vs_stay_length", (hotel_type, stay_length_range)))
+        jobs.append(("cancellations_by_lead_time", (hotel_type,)))
+        jobs.append(("cancellation_trends_by_month", (hotel_type,)))
+    return jobs
+
+
+# Runs in a pool process: build one figure and return its JSON. A failed build is reported, not cached.
+def _render(name, args):
+    fig = getattr(plots, name)(*args)
+    if isinstance(fig, plots.ErrorFigure):
+        raise RuntimeError(fig.layout.annotations[0].text)
+    return figure_json(fig)
+
+
+# Pre-render the common figures into the figure cache within a time budget
+def warm_cache(time_budget=WARMUP_TIME_BUDGET, processes=WARMUP_PROCESSES, cache=figure_cache):
+    started = time.time()
+    report = {'warmed': [], 'cached': [], 'failed': [], 'skipped': []}
+    pending = {}
+    for name, args in warmup_jobs():
+        key = cache.key(getattr(plots, name), *args)
+        if cache.has(key):
+            report['cached'].append([name, list(args)])
+        else:
+            pending[key] = (name, args)
+
+    if pending:
+        # A multiprocessing pool, since terminate() stops renders still running at the deadline;
+        # left running they would compete with live traffic when warming at startup
+        pool = multiprocessing.Pool(processes)
+        finished = queue.Queue()
+        try:
+            for key, (name, args) in pending.items():
+                pool.apply_async(_render, (name, args),
+                                 callback=lambda payload, key=key: finished.put((key, payload, None)),
+                                 error_callback=lambda error, key=key: finished.put((key, None, error)))
+            remaining = set(pending)
+            while remaining:
+                timeout = time_budget - (time.time() - started)
+                if timeout <= 0:
+                    break
+                try:
+                    key, payload, error = finished.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                remaining.discard(key)
+                name, args = pending[key]
+                if error is None:
+                    cache.set(key, payload)
+                    report['warmed'].append([name, list(args)])
+                else:
+                    report['failed'].append([name, list(args), str(error)])
+            for key in remaining:
+                name, args = pending[key]
+                report['skipped'].append([name, list(args)])
+        finally:
+            pool.terminate()
+            pool.join()
+
+    report['elapsed_seconds'] = round(time.time() - started, 3)
+    report['time_budget_seconds'] = time_budget
+    report['dataset_version'] = plots.dataset_version
+    return report
+
+
+# One-line summary of a warm_cache() report
+def report_summary(report):
+    return (f"{len(report['warmed'])} warmed, {len(report['cached'])} already cached, {len(report['failed'])} failed, "
+            f"{len(report['skipped'])} skipped in {report['elapsed_seconds']:.1f}s (budget {report['time_budget_seconds']:g}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render dashboard figures into the figure cache.")
+    parser.add_argument("--budget", type=float, default=WARMUP_TIME_BUDGET, help="time budget in seconds")
+    parser.add_argument("--processes", type=int, default=WARMUP_PROCESSES, help="size of the process pool")
+    args = parser.parse_args()
+    if not figure_cache.directory:
+        print("FIGURE_CACHE_DIR is not set; figures warmed by this command are not visible to the app.")
+    report = warm_cache(args.budget, args.processes)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import glob
+import os
+import tempfile
+
+# Serve with: gunicorn app:server (this file is picked up from the working directory)
+bind = os.environ.get("BIND", "0.0.0.0:10000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+# Import the app and load the dataset once in the master before forking, so the workers share
+# the imported modules, the filter index and the aggregate cube copy-on-write and start serving
+# without loading anything themselves (PRELOAD_APP=0 loads in every worker on first use instead)
+preload_app = os.environ.get("PRELOAD_APP", "1") == "1"
+if preload_app:
+    # Tells app.py to leave its per-process threads to post_fork below
+    os.environ["APP_PRELOADED"] = "1"
+
+
+# Every worker publishes its callback metrics here and /metrics reports their sum. Snapshots of
+# an earlier server are removed at start, so the counters begin at zero with every server.
+metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"dash-metrics-{os.getpid()}"))
+
+
+def _remove_metrics():
+    for path in glob.glob(os.path.join(metrics_dir, "metrics-*.json")):
+        os.remove(path)
+
+
+def on_starting(server):
+    _remove_metrics()
+
+
+def on_exit(server):
+    _remove_metrics()
+    try:
+        os.rmdir(metrics_dir)
+    except OSError:
+        pass
+
+
+def when_ready(server):
+    if preload_app:
+        from components import plots
+        plots.preload()
+        server.log.info("Dataset preloaded: %s", {step: round(seconds, 3) for step, seconds in plots.load_timings.items()})
+
+
+# Threads do not survive fork: start the ingestion watcher in every worker
+def post_fork(server, worker):
+    if preload_app:
+        from app import start_background_tasks
+        start_background_tasks()
@@ -1,154 +1,224 @@
 # pages/revenue_cancellations.py
 import dash
-from dash import dcc, html, callback
+from dash import dcc, html, callback, clientside_callback, no_update, Patch
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
-from components.plots import adr_vs_stay_length, cancellations_by_lead_time, cancellation_trends_by_month
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from components.cache import figure_cache
+from components.callbacks import CALLBACK_MODE, EXECUTION_MODE, SLIDER_MODE, background_figure, lazy_tab_figure, needs_render, rendered_store, slider_update
+from components.metrics import instrument
+from components.plots import hotel_options, adr_vs_stay_length, stay_length_aggregates, cancellations_by_lead_time, cancellation_trends_by_month
+
+# Figures on the tabs; outside the batched callback each has its own callback and rendered-arguments store
+TAB_GRAPHS = ["adr-stay-plot", "cancel-lead-time-plot", "cancel-trends-plot"]
 
 # Define the layout for the Revenue & Cancellations page
-layout = dbc.Container([
-    html.H2("Revenue & Cancellations", className="mt-4 mb-4 text-center"),
+def layout():
+    return dbc.Container([
+        html.H2("Revenue & Cancellations", className="mt-4 mb-4 text-center"),
     
-    # Hotel Type Filter
-    dbc.Row([
-        dbc.Col([
-            html.Label("Select Hotel Type:"),
-            dcc.Dropdown(
-                id="hotel-type-dropdown-rc",
-                options=[
-                    {"label": "All", "value": "All"},
-                    {"label": "Resort Hotel", "value": "Resort Hotel"},
-                    {"label": "City Hotel", "value": "City Hotel"},
-                ],
-                value="All",
-                clearable=False,
-                style={"width": "100%"}
-            ),
-        ], width=4, className="mb-4"),
-    ], justify="center"),
-
-    # Tabs for Revenue and Cancellations
-    dbc.Tabs([
-        # Tab 1: Revenue Insights
-        dbc.Tab(label="Revenue Insights", children=[
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("4. What Drives Revenue? (ADR and Stay Length)"),
-                        dbc.CardBody([
-                            html.Label("Select Stay Length Range:"),
-                            dcc.RangeSlider(
-                                id="stay-length-slider",
-                                min=0,
-                                max=50,
-                                step=1,
-                                value=[0, 50],
-                                marks={0: "0", 10: "10", 20: "20", 30: "30", 40: "40", 50: "50"},
-                                className="mb-3"
-                            ),
-                            dcc.Graph(id="adr-stay-plot"),
-                            html.H5("Insight:"),
-                            html.P("Higher revenue is associated with longer stays and higher ADRs. Resort Hotels benefit from mid-length stays (5-10 nights), while City Hotels rely on volume."),
-                            html.H5("Recommendation:"),
-                            html.P("Resort Hotels should target premium pricing for mid-length stays, while City Hotels can focus on competitive rates for shorter stays.")
+        # Hotel Type Filter
+        dbc.Row([
+            dbc.Col([
+                html.Label("Select Hotel Type:"),
+                dcc.Dropdown(
+                    id="hotel-type-dropdown-rc",
+                    options=hotel_options(),
+                    value="All",
+                    clearable=False,
+                    style={"width": "100%"}
+                ),
+            ], width=4, className="mb-4"),
+        ], justify="center"),
+
+        # Arguments each figure was last rendered with; figures on hidden tabs are computed on first activation
+        dcc.Store(id="rc-rendered", data={}),
+        *[dcc.Store(id=rendered_store(graph_id)) for graph_id in TAB_GRAPHS],
+
+        # Tabs for Revenue and Cancellations
+        dbc.Tabs(id="rc-tabs", active_tab="revenue-tab", children=[
+            # Tab 1: Revenue Insights
+            dbc.Tab(label="Revenue Insights", tab_id="revenue-tab", children=[
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("4. What Drives Revenue? (ADR and Stay Length)"),
+                            dbc.CardBody([
+                                html.Label("Select Stay Length Range:"),
+                                dcc.RangeSlider(
+                                    id="stay-length-slider",
+                                    min=0,
+                                    max=50,
+                                    step=1,
+                                    value=[0, 50],
+                                    marks={0: "0", 10: "10", 20: "20", 30: "30", 40: "40", 50: "50"},
+                                    className="mb-3"
+                                ),
+                                dcc.Store(id="stay-length-aggregates"),
+                                dcc.Graph(id="adr-stay-plot"),
+                                html.H5("Insight:"),
+                                html.P("Higher revenue is associated with longer stays and higher ADRs. Resort Hotels benefit from mid-length stays (5-10 nights), while City Hotels rely on volume."),
+                                html.H5("Recommendation:"),
+                                html.P("Resort Hotels should target premium pricing for mid-length stays, while City Hotels can focus on competitive rates for shorter stays.")
+                            ])
                         ])
-                    ])
-                ], width=12)
-            ], className="mb-4"),
-        ]),
+                    ], width=12)
+                ], className="mb-4"),
+            ]),
 
-        # Tab 2: Cancellation Insights
-        dbc.Tab(label="Cancellation Insights", children=[
-            # Section 5: Cancellations by Lead Time
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("5. Why Do Guests Cancel? (Cancellations by Lead Time and Hotel Type)"),
-                        dbc.CardBody([
-                            dcc.Graph(id="cancel-lead-time-plot"),
-                            html.H5("Insight:"),
-                            html.P("Canceled bookings have higher lead times (Resort Hotels: median ~120 days, City Hotels: ~100 days), suggesting uncertainty over longer timeframes."),
-                            html.H5("Recommendation:"),
-                            html.P("Implement stricter cancellation policies for long lead times, or offer incentives for non-refundable bookings.")
+            # Tab 2: Cancellation Insights
+            dbc.Tab(label="Cancellation Insights", tab_id="cancellations-tab", children=[
+                # Section 5: Cancellations by Lead Time
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("5. Why Do Guests Cancel? (Cancellations by Lead Time and Hotel Type)"),
+                            dbc.CardBody([
+                                dcc.Graph(id="cancel-lead-time-plot"),
+                                html.H5("Insight:"),
+                                html.P("Canceled bookings have higher lead times (Resort Hotels: median ~120 days, City Hotels: ~100 days), suggesting uncertainty over longer timeframes."),
+                                html.H5("Recommendation:"),
+                                html.P("Implement stricter cancellation policies for long lead times, or offer incentives for non-refundable bookings.")
+                            ])
                         ])
-                    ])
-                ], width=12)
-            ], className="mb-4"),
-
-            # Section 6: Cancellation Trends by Month
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader("6. When Are Cancellations Most Likely? (Cancellation Trends by Month)"),
-                        dbc.CardBody([
-                            dcc.Graph(id="cancel-trends-plot"),
-                            html.H5("Insight:"),
-                            html.P("City Hotels peak in April (~35%) due to corporate clients, while Resort Hotels drop in August (~15%) due to committed summer plans."),
-                            html.H5("Recommendation:"),
-                            html.P("City Hotels should offer incentives in spring, while Resort Hotels can confidently offer last-minute deals in summer.")
+                    ], width=12)
+                ], className="mb-4"),
+
+                # Section 6: Cancellation Trends by Month
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader("6. When Are Cancellations Most Likely? (Cancellation Trends by Month)"),
+                            dbc.CardBody([
+                                dcc.Graph(id="cancel-trends-plot"),
+                                html.H5("Insight:"),
+                                html.P("City Hotels peak in April (~35%) due to corporate clients, while Resort Hotels drop in August (~15%) due to committed summer plans."),
+                                html.H5("Recommendation:"),
+                                html.P("City Hotels should offer incentives in spring, while Resort Hotels can confidently offer last-minute deals in summer.")
+                            ])
                         ])
-                    ])
-                ], width=12)
-            ], className="mb-4"),
+                    ], width=12)
+                ], className="mb-4"),
+            ]),
         ]),
-    ]),
-
-    # Summary of Recommendations
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Summary of Recommendations"),
-                dbc.CardBody([
-                    html.Table([
-                        html.Thead([
-                            html.Tr([
-                                html.Th("Hotel Type"),
-                                html.Th("Strategy"),
-                                html.Th("Focus Area"),
+
+        # Summary of Recommendations
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Summary of Recommendations"),
+                    dbc.CardBody([
+                        html.Table([
+                            html.Thead([
+                                html.Tr([
+                                    html.Th("Hotel Type"),
+                                    html.Th("Strategy"),
+                                    html.Th("Focus Area"),
+                                ])
+                            ]),
+                            html.Tbody([
+                                html.Tr([html.Td("Resort Hotel"), html.Td("Early-bird discounts"), html.Td("Long lead-time bookings")]),
+                                html.Tr([html.Td("Resort Hotel"), html.Td("Extended-stay packages"), html.Td("Summer months (July, August)")]),
+                                html.Tr([html.Td("Resort Hotel"), html.Td("Group packages"), html.Td("Groups market segment")]),
+                                html.Tr([html.Td("Resort Hotel"), html.Td("Premium pricing"), html.Td("Mid-length stays (5-10 nights)")]),
+                                html.Tr([html.Td("Resort Hotel"), html.Td("Stricter cancellation policies"), html.Td("Long lead times, spring")]),
+                                html.Tr([html.Td("Resort Hotel"), html.Td("Last-minute deals"), html.Td("Summer (low cancellation risk)")]),
+                                html.Tr([html.Td("City Hotel"), html.Td("Last-minute marketing (flash sales)"), html.Td("Short lead-time bookings")]),
+                                html.Tr([html.Td("City Hotel"), html.Td("Optimize room turnover"), html.Td("Short stays year-round")]),
+                                html.Tr([html.Td("City Hotel"), html.Td("Optimize online booking platforms"), html.Td("Online TA segment")]),
+                                html.Tr([html.Td("City Hotel"), html.Td("Corporate amenities"), html.Td("Corporate segment")]),
+                                html.Tr([html.Td("City Hotel"), html.Td("Competitive pricing"), html.Td("Short stays")]),
+                                html.Tr([html.Td("City Hotel"), html.Td("Incentives (e.g., loyalty points)"), html.Td("Spring (high cancellation risk)")]),
                             ])
-                        ]),
-                        html.Tbody([
-                            html.Tr([html.Td("Resort Hotel"), html.Td("Early-bird discounts"), html.Td("Long lead-time bookings")]),
-                            html.Tr([html.Td("Resort Hotel"), html.Td("Extended-stay packages"), html.Td("Summer months (July, August)")]),
-                            html.Tr([html.Td("Resort Hotel"), html.Td("Group packages"), html.Td("Groups market segment")]),
-                            html.Tr([html.Td("Resort Hotel"), html.Td("Premium pricing"), html.Td("Mid-length stays (5-10 nights)")]),
-                            html.Tr([html.Td("Resort Hotel"), html.Td("Stricter cancellation policies"), html.Td("Long lead times, spring")]),
-                            html.Tr([html.Td("Resort Hotel"), html.Td("Last-minute deals"), html.Td("Summer (low cancellation risk)")]),
-                            html.Tr([html.Td("City Hotel"), html.Td("Last-minute marketing (flash sales)"), html.Td("Short lead-time bookings")]),
-                            html.Tr([html.Td("City Hotel"), html.Td("Optimize room turnover"), html.Td("Short stays year-round")]),
-                            html.Tr([html.Td("City Hotel"), html.Td("Optimize online booking platforms"), html.Td("Online TA segment")]),
-                            html.Tr([html.Td("City Hotel"), html.Td("Corporate amenities"), html.Td("Corporate segment")]),
-                            html.Tr([html.Td("City Hotel"), html.Td("Competitive pricing"), html.Td("Short stays")]),
-                            html.Tr([html.Td("City Hotel"), html.Td("Incentives (e.g., loyalty points)"), html.Td("Spring (high cancellation risk)")]),
-                        ])
-                    ], className="table table-striped")
+                        ], className="table table-striped")
+                    ])
                 ])
-            ])
-        ], width=12)
-    ], className="mb-4"),
-], fluid=True)
-
-# Callback for ADR vs. Stay Length Plot
-@callback(
-    Output("adr-stay-plot", "figure"),
-    [Input("hotel-type-dropdown-rc", "value"),
-     Input("stay-length-slider", "value")]
-)
-def update_adr_stay_plot(hotel_type, stay_length_range):
-    return adr_vs_stay_length(hotel_type, stay_length_range)
-
-# Callback for Cancellations by Lead Time Plot
-@callback(
-    Output("cancel-lead-time-plot", "figure"),
-    [Input("hotel-type-dropdown-rc", "value")]
-)
+            ], width=12)
+        ], className="mb-4"),
+    ], fluid=True)
+
+if SLIDER_MODE == "clientside":
+    # The server ships per-stay-length sums once per hotel selection; the slider filters them in the browser
+    ADR_STAY_OUTPUT = Output("stay-length-aggregates", "data")
+    ADR_STAY_INPUTS = [Input("hotel-type-dropdown-rc", "value")]
+
+    def update_adr_stay_plot(hotel_type):
+        return figure_cache.data(stay_length_aggregates, hotel_type)
+
+    clientside_callback(
+        ClientsideFunction(namespace="hotel_dashboard", function_name="adr_stay_figure"),
+        Output("adr-stay-plot", "figure"),
+        [Input("stay-length-aggregates", "data"),
+         Input("stay-length-slider", "value")]
+    )
+else:
+    ADR_STAY_OUTPUT = Output("adr-stay-plot", "figure")
+    ADR_STAY_INPUTS = [Input("hotel-type-dropdown-rc", "value"),
+                       Input("stay-length-slider", "value")]
+
+    def update_adr_stay_plot(hotel_type, stay_length_range):
+        return slider_update(figure_cache.figure(adr_vs_stay_length, hotel_type, stay_length_range), "stay-length-slider")
+
 def update_cancel_lead_time_plot(hotel_type):
-    return cancellations_by_lead_time(hotel_type)
+    return figure_cache.figure(cancellations_by_lead_time, hotel_type)
 
-# Callback for Cancellation Trends by Month Plot
-@callback(
-    Output("cancel-trends-plot", "figure"),
-    [Input("hotel-type-dropdown-rc", "value")]
-)
 def update_cancel_trends_plot(hotel_type):
-    return cancellation_trends_by_month(hotel_type)
\ No newline at end of file
+    return figure_cache.figure(cancellation_trends_by_month, hotel_type)
+
+# The server-rendered ADR figure is built in a background process in background mode
+BACKGROUND_ADR_STAY = EXECUTION_MODE == "background" and SLIDER_MODE == "server"
+
+# Outputs, inputs and state of a tab figure registered as its own callback
+def tab_figure_dependencies(output, inputs, graph_id):
+    return (
+        [output, Output(rendered_store(graph_id), "data")],
+        inputs + [Input("rc-tabs", "active_tab")],
+        [State(rendered_store(graph_id), "data")],
+    )
+
+if BACKGROUND_ADR_STAY:
+    background_figure(instrument(lazy_tab_figure(update_adr_stay_plot, "revenue-tab")), "adr-stay-plot",
+                      *tab_figure_dependencies(ADR_STAY_OUTPUT, ADR_STAY_INPUTS, "adr-stay-plot"))
+
+if CALLBACK_MODE == "batched":
+    # One round-trip per change; only figures on the active tab whose inputs changed are recomputed
+    @callback(
+        ([] if BACKGROUND_ADR_STAY else [ADR_STAY_OUTPUT]) +
+        [Output("cancel-lead-time-plot", "figure"),
+         Output("cancel-trends-plot", "figure"),
+         Output("rc-rendered", "data")],
+        (ADR_STAY_INPUTS[:1] if BACKGROUND_ADR_STAY else ADR_STAY_INPUTS) + [Input("rc-tabs", "active_tab")],
+        [State("rc-rendered", "data")]
+    )
+    @instrument
+    def update_revenue_cancellations_plots(hotel_type, *values):
+        *stay_length_range, active_tab, rendered = values
+        rendered = rendered or {}
+        # Only the entries of the figures rendered now are sent
+        recorded = Patch()
+        figures = []
+        for graph_id, tab_id, update, args in [
+            ("adr-stay-plot", "revenue-tab", update_adr_stay_plot, [hotel_type, *stay_length_range]),
+            ("cancel-lead-time-plot", "cancellations-tab", update_cancel_lead_time_plot, [hotel_type]),
+            ("cancel-trends-plot", "cancellations-tab", update_cancel_trends_plot, [hotel_type]),
+        ][1 if BACKGROUND_ADR_STAY else 0:]:
+            if needs_render(active_tab, tab_id, rendered.get(graph_id), args):
+                figures.append(update(*args))
+                recorded[graph_id] = args
+            else:
+                figures.append(no_update)
+        if all(figure is no_update for figure in figures):
+            return (no_update,) * (len(figures) + 1)
+        return (*figures, recorded)
+else:
+    # Callback for ADR vs. Stay Length Plot
+    if not BACKGROUND_ADR_STAY:
+        callback(*tab_figure_dependencies(ADR_STAY_OUTPUT, ADR_STAY_INPUTS, "adr-stay-plot"))(
+            instrument(lazy_tab_figure(update_adr_stay_plot, "revenue-tab")))
+
+    # Callback for Cancellations by Lead Time Plot
+    callback(*tab_figure_dependencies(Output("cancel-lead-time-plot", "figure"), [Input("hotel-type-dropdown-rc", "value")], "cancel-lead-time-plot"))(
+        instrument(lazy_tab_figure(update_cancel_lead_time_plot, "cancellations-tab")))
+
+    # Callback for Cancellation Trends by Month Plot
+    callback(*tab_figure_dependencies(Output("cancel-trends-plot", "figure"), [Input("hotel-type-dropdown-rc", "value")], "cancel-trends-plot"))(
+        instrument(lazy_tab_figure(update_cancel_trends_plot, "cancellations-tab")))